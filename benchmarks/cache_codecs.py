@@ -0,0 +1,50 @@
+"""Compare cache codecs on the payloads the bot actually stores.
+
+Run from the repository root:
+
+    python -m benchmarks.cache_codecs
+"""
+import argparse
+import timeit
+from dataclasses import asdict
+
+from cache_codecs import ValueSerializer, available_codecs, available_compressors
+from config import TarotConfig
+from db.models import User
+
+
+def build_payloads():
+    user = User.create_new(123456789, default_balance=10)
+    user.referrals.referrals_list = [str(1000000 + i) for i in range(50)]
+    tarot = TarotConfig()
+    return {
+        "user": asdict(user),
+        "rider_waite_cards": tarot.rider_waite_cards,
+        "users_x100": [asdict(User.create_new(1000 + i)) for i in range(100)],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="iterations per measurement")
+    args = parser.parse_args()
+    
+    payloads = build_payloads()
+    compressions = [None] + list(available_compressors())
+    
+    print(f"{'payload':<18} {'codec':<8} {'compression':<11} {'bytes':>7} {'encode us':>10} {'decode us':>10}")
+    for payload_name, payload in payloads.items():
+        for codec in available_codecs():
+            for compression in compressions:
+                serializer = ValueSerializer(codec, compression, compression_threshold=256)
+                data = serializer.dumps(payload)
+                encode = timeit.timeit(lambda: serializer.dumps(payload), number=args.number)
+                decode = timeit.timeit(lambda: serializer.loads(data), number=args.number)
+                print(
+                    f"{payload_name:<18} {codec:<8} {compression or '-':<11} {len(data):>7} "
+                    f"{encode / args.number * 1e6:>10.2f} {decode / args.number * 1e6:>10.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
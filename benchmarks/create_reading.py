@@ -0,0 +1,113 @@
+"""Measure TarotService.create_reading throughput and tail latency offline.
+
+Starts the bundled fake OpenAI server in-process (or uses --base-url) and
+drives readings through the real GPTService stack: shared client, retries,
+admission control and circuit breaker.
+
+    python -m benchmarks.create_reading --requests 500 --concurrency 50 --latency-ms 800
+    python -m benchmarks.create_reading --stream --rate-limit-rate 0.05 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from benchmarks.fake_openai import FakeOpenAIServer, add_server_arguments, config_from_args
+from benchmarks.stats import format_summary
+from config import settings
+from gpt_client import GPTClientFactory
+from gpt_service import GPTService
+from services import TarotService
+
+QUESTIONS = [
+    "Что меня ждёт в работе?",
+    "Стоит ли мне переезжать в другой город в этом году?",
+    "Как сложатся отношения с человеком, с которым я недавно познакомилась?",
+    "Я давно думаю о смене профессии, но боюсь потерять стабильный доход. "
+    "Карты, подскажите, готова ли я сейчас к такому шагу и на что обратить внимание?",
+]
+
+
+async def run_reading(service: TarotService, user_id: int, question: str, stream: bool):
+    if not stream:
+        return await service.create_reading(user_id=user_id, question=question)
+    
+    reading = None
+    async for reading in service.stream_reading(user_id=user_id, question=question):
+        pass
+    return reading
+
+
+async def bench(service: TarotService, requests: int, concurrency: int, stream: bool) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    fallbacks = 0
+    failures = 0
+    
+    async def one(index: int) -> None:
+        nonlocal fallbacks, failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                reading = await run_reading(service, index, QUESTIONS[index % len(QUESTIONS)], stream)
+            except Exception as e:
+                failures += 1
+                print(f"Error creating reading: {e}")
+                return
+            latencies.append(time.perf_counter() - started)
+            if reading.is_fallback:
+                fallbacks += 1
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+    
+    mode = "stream_reading" if stream else "create_reading"
+    print(f"{mode}: {requests} readings at concurrency {concurrency} in {elapsed:.2f}s "
+          f"({requests / elapsed:.1f} readings/s)")
+    print(format_summary("latency", latencies))
+    print(f"fallback readings: {fallbacks}  failures: {failures}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--stream", action="store_true", help="benchmark stream_reading instead")
+    parser.add_argument("--two-call", action="store_true", help="use separate interpretation and advice calls")
+    parser.add_argument("--base-url", default="", help="existing OpenAI-compatible endpoint; defaults to a local fake")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    
+    server = None
+    base_url = args.base_url
+    if not base_url:
+        server = FakeOpenAIServer(config_from_args(args))
+        base_url = await server.start()
+        # The fake server accepts any key; never send the real one to it
+        settings.openai.API_KEY = "fake"
+    
+    settings.openai.BASE_URL = base_url
+    settings.openai.COMBINED_GENERATION = not args.two_call
+    
+    client = GPTClientFactory.create_gpt_client()
+    gpt_service = GPTService(client=client)
+    service = TarotService(settings.tarot, gpt_service=gpt_service)
+    
+    try:
+        await bench(service, args.requests, args.concurrency, args.stream)
+        print(f"client:    {client.get_stats()}")
+        print(f"admission: {gpt_service.admission.get_stats()}")
+        print(f"breaker:   {gpt_service.breaker.get_stats()}")
+        for model, usage in gpt_service.metrics.get_stats()["models"].items():
+            print(f"usage {model}: {usage}")
+        if server:
+            print(f"server:    {server.stats}")
+    finally:
+        await client.close()
+        if server:
+            await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,266 @@
+"""Local OpenAI-compatible chat completions server for offline load tests.
+
+Serves POST /v1/chat/completions, streaming and non-streaming, with a
+programmable latency distribution, injected 5xx errors and 429 responses.
+Point the bot or a benchmark at it with OPENAI_BASE_URL:
+    
+    python -m benchmarks.fake_openai --port 8089 --latency-ms 800 --rate-limit-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake python main.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+from gpt_service import GPTService
+
+FIXED = "fixed"
+UNIFORM = "uniform"
+LOGNORMAL = "lognormal"
+
+INTERPRETATION = (
+    "Эта карта говорит о том, что ситуация вокруг вашего вопроса постепенно проясняется. "
+    "Энергия карты помогает увидеть скрытые возможности и принять решение спокойно."
+)
+ADVICE = (
+    "Не торопитесь с выводами, соберите больше сведений и доверьтесь своей интуиции. "
+    "Сделайте первый небольшой шаг уже на этой неделе."
+)
+
+
+@dataclass
+class FakeOpenAIConfig:
+    latency_ms: float = 800.0
+    distribution: str = LOGNORMAL
+    # Sigma for lognormal, relative half-width for uniform
+    spread: float = 0.5
+    ttft_ratio: float = 0.3
+    chunks: int = 20
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    seed: Optional[int] = None
+
+
+@dataclass
+class FakeOpenAIStats:
+    requests: int = 0
+    streamed: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    by_status: Dict[int, int] = field(default_factory=dict)
+
+
+class FakeOpenAIServer:
+    
+    def __init__(self, config: Optional[FakeOpenAIConfig] = None):
+        self.config = config or FakeOpenAIConfig()
+        self.stats = FakeOpenAIStats()
+        self._random = random.Random(self.config.seed)
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+    
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle)
+        return app
+    
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}/v1"
+        return self.base_url
+    
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    def sample_latency(self) -> float:
+        config = self.config
+        median = config.latency_ms / 1000
+        if config.distribution == FIXED:
+            return median
+        if config.distribution == UNIFORM:
+            return self._random.uniform(median * (1 - config.spread), median * (1 + config.spread))
+        return self._random.lognormvariate(0, config.spread) * median
+    
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.stats.requests += 1
+        body = await request.json()
+        
+        roll = self._random.random()
+        if roll < self.config.rate_limit_rate:
+            self.stats.rate_limited += 1
+            return self._error(429, "rate_limit_exceeded", {"retry-after": str(self.config.retry_after)})
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self.stats.errors += 1
+            await asyncio.sleep(self.sample_latency() * self.config.ttft_ratio)
+            return self._error(500, "server_error")
+        
+        content = self._build_content(body)
+        usage = self._build_usage(body, content)
+        latency = self.sample_latency()
+        
+        if body.get("stream"):
+            self.stats.streamed += 1
+            return await self._stream(request, body, content, usage, latency)
+        
+        await asyncio.sleep(latency)
+        self._count(200)
+        return web.json_response({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content}
+            }],
+            "usage": usage
+        })
+    
+    async def _stream(
+        self,
+        request: web.Request,
+        body: Dict[str, Any],
+        content: str,
+        usage: Dict[str, Any],
+        latency: float
+    ) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        size = max(1, len(content) // self.config.chunks)
+        parts = [content[i:i + size] for i in range(0, len(content), size)]
+        ttft = latency * self.config.ttft_ratio
+        gap = (latency - ttft) / max(1, len(parts) - 1)
+        
+        await asyncio.sleep(ttft)
+        for index, part in enumerate(parts):
+            if index:
+                await asyncio.sleep(gap)
+            await self._send_chunk(response, body, completion_id, {"content": part}, None)
+        await self._send_chunk(response, body, completion_id, {}, "stop")
+        
+        if (body.get("stream_options") or {}).get("include_usage"):
+            await self._send_event(response, {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [],
+                "usage": usage
+            })
+        
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        self._count(200)
+        return response
+    
+    async def _send_chunk(
+        self,
+        response: web.StreamResponse,
+        body: Dict[str, Any],
+        completion_id: str,
+        delta: Dict[str, Any],
+        finish_reason: Optional[str]
+    ) -> None:
+        await self._send_event(response, {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        })
+    
+    async def _send_event(self, response: web.StreamResponse, payload: Dict[str, Any]) -> None:
+        await response.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+    
+    def _build_content(self, body: Dict[str, Any]) -> str:
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            return json.dumps({"interpretation": INTERPRETATION, "advice": ADVICE}, ensure_ascii=False)
+        if body.get("stream"):
+            return f"{INTERPRETATION}\n{GPTService.ADVICE_MARKER}\n{ADVICE}"
+        return INTERPRETATION
+    
+    def _build_usage(self, body: Dict[str, Any], content: str) -> Dict[str, Any]:
+        # Roughly four characters per token is close enough for load tests
+        prompt_chars = sum(len(message.get("content") or "") for message in body.get("messages", []))
+        prompt_tokens = prompt_chars // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": 0}
+        }
+    
+    def _error(self, status: int, code: str, headers: Optional[Dict[str, str]] = None) -> web.Response:
+        self._count(status)
+        return web.json_response(
+            {"error": {"message": f"Injected {code}", "type": code, "code": code}},
+            status=status,
+            headers=headers
+        )
+    
+    def _count(self, status: int) -> None:
+        self.stats.by_status[status] = self.stats.by_status.get(status, 0) + 1
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="median response latency")
+    parser.add_argument("--distribution", choices=(FIXED, UNIFORM, LOGNORMAL), default=LOGNORMAL)
+    parser.add_argument("--spread", type=float, default=0.5, help="lognormal sigma or uniform half-width ratio")
+    parser.add_argument("--ttft-ratio", type=float, default=0.3, help="share of latency before the first streamed chunk")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeOpenAIConfig:
+    return FakeOpenAIConfig(
+        latency_ms=args.latency_ms,
+        distribution=args.distribution,
+        spread=args.spread,
+        ttft_ratio=args.ttft_ratio,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    
+    server = FakeOpenAIServer(config_from_args(args))
+    base_url = await server.start(args.host, args.port)
+    print(f"Fake OpenAI listening on {base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,193 @@
+"""Micro-benchmarks for the bot's hot helpers, with a regression gate.
+
+Covers the validator, the in-process cache tier and value serializer, the
+in-memory rate limiter and the repository's row mapping, using realistic
+inputs: Russian text, maximum-length messages and many distinct users.
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --save-baseline baseline.json
+    python -m benchmarks.micro --compare baseline.json --threshold 0.15
+
+With --compare the exit status is 1 when any case is slower than its baseline
+by more than the threshold, so it can gate CI.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import platform
+import sys
+import time
+from dataclasses import asdict
+from typing import Callable, Dict, List, Tuple
+
+from cache import CacheManager
+from cache_codecs import ValueSerializer
+from db.models import User
+from postgresql_repository import PostgreSQLUserRepository
+from rate_limiter import GCRA, MemoryRateLimitChecker, RateLimit
+from validators import SecurityValidator
+
+USERS = 10_000
+
+SHORT_QUESTION = "Что меня ждет в работе в ближайшие три месяца?"
+RUSSIAN_PARAGRAPH = (
+    "Я давно думаю о смене профессии, но боюсь потерять стабильный доход. "
+    "Подскажите, готова ли я сейчас к такому шагу и на что обратить внимание, "
+    "чтобы не пожалеть о решении через год? "
+)
+MAX_LENGTH_QUESTION = (RUSSIAN_PARAGRAPH * 10)[:SecurityValidator.MAX_MESSAGE_LENGTH]
+
+Case = Tuple[str, Callable, bool]
+
+
+def build_user(user_id: int) -> User:
+    user = User.create_new(user_id, default_balance=10)
+    user.referrals.referrals_list = [str(1_000_000 + i) for i in range(20)]
+    return user
+
+
+def validator_cases() -> List[Case]:
+    validator = SecurityValidator()
+    return [
+        ("validator.validate_message_text[short]", lambda: validator.validate_message_text(SHORT_QUESTION), False),
+        ("validator.validate_message_text[max_len]", lambda: validator.validate_message_text(MAX_LENGTH_QUESTION), False),
+        ("validator.sanitize_text[max_len]", lambda: validator.sanitize_text(MAX_LENGTH_QUESTION), False),
+        ("validator.validate_user_id", lambda: validator.validate_user_id("123456789"), False),
+    ]
+
+
+def cache_cases() -> List[Case]:
+    # Never initialized, so the manager stays on its in-process tier
+    cache = CacheManager()
+    payloads = [asdict(build_user(100_000 + i)) for i in range(USERS)]
+    keys = [f"user:{100_000 + i}" for i in range(USERS)]
+    asyncio.run(cache.set_many(dict(zip(keys, payloads)), ttl=3600))
+    
+    set_items = itertools.cycle(list(zip(keys, payloads)))
+    get_keys = itertools.cycle(keys)
+    
+    async def cache_set():
+        key, value = next(set_items)
+        await cache.set(key, value, ttl=3600)
+    
+    async def cache_get():
+        await cache.get(next(get_keys))
+    
+    serializer = ValueSerializer("json", "zlib", 1024)
+    encoded = serializer.dumps(payloads[0])
+    return [
+        ("cache.set[user, 10k keys]", cache_set, True),
+        ("cache.get[user, 10k keys]", cache_get, True),
+        ("serializer.dumps[user]", lambda: serializer.dumps(payloads[0]), False),
+        ("serializer.loads[user]", lambda: serializer.loads(encoded), False),
+    ]
+
+
+def rate_limiter_cases() -> List[Case]:
+    checker = MemoryRateLimitChecker()
+    window_limit = RateLimit(requests=1000, window_seconds=60, block_duration_seconds=0)
+    gcra_limit = RateLimit(requests=1000, window_seconds=60, block_duration_seconds=0, algorithm=GCRA)
+    keys = itertools.cycle([f"rate_limit:message:{100_000 + i}" for i in range(USERS)])
+    
+    def check_window():
+        now = int(time.time())
+        checker.check_memory_limit(next(keys), window_limit, now, now - window_limit.window_seconds)
+    
+    def check_gcra():
+        checker.check_memory_gcra(next(keys), gcra_limit, time.time())
+    
+    return [
+        ("rate_limiter.check_memory_limit[10k users]", check_window, False),
+        ("rate_limiter.check_memory_gcra[10k users]", check_gcra, False),
+    ]
+
+
+def repository_cases() -> List[Case]:
+    repository = PostgreSQLUserRepository()
+    user = build_user(123456789)
+    row = repository._user_to_model(user)
+    data = repository._user_to_dict(user)
+    return [
+        ("repository._model_to_user", lambda: repository._model_to_user(row), False),
+        ("repository._user_to_model", lambda: repository._user_to_model(user), False),
+        ("repository._dict_to_user", lambda: repository._dict_to_user(data), False),
+        ("repository._user_to_dict", lambda: repository._user_to_dict(user), False),
+    ]
+
+
+def time_case(func: Callable, is_async: bool, number: int) -> float:
+    if not is_async:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - started
+    
+    async def run() -> float:
+        started = time.perf_counter()
+        for _ in range(number):
+            await func()
+        return time.perf_counter() - started
+    
+    return asyncio.run(run())
+
+
+def measure(func: Callable, is_async: bool, repeat: int, min_time: float) -> float:
+    number = 1
+    while time_case(func, is_async, number) < min_time:
+        number *= 2
+    # The fastest run is the least disturbed by the rest of the system
+    return min(time_case(func, is_async, number) for _ in range(repeat)) / number
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds per timed run")
+    parser.add_argument("--save-baseline", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown, 0.15 = 15%%")
+    args = parser.parse_args()
+    
+    baseline: Dict[str, float] = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    
+    cases = validator_cases() + cache_cases() + rate_limiter_cases() + repository_cases()
+    results: Dict[str, float] = {}
+    regressions = []
+    
+    for name, func, is_async in cases:
+        if args.filter not in name:
+            continue
+        seconds = measure(func, is_async, args.repeat, args.min_time)
+        results[name] = seconds
+        line = f"{name:<45} {seconds * 1e9:>12.0f} ns/op {1 / seconds:>14,.0f} ops/s"
+        
+        if name in baseline:
+            change = seconds / baseline[name] - 1
+            status = "ok"
+            if change > args.threshold:
+                status = "REGRESSION"
+                regressions.append(name)
+            line += f"  {change:>+8.1%} vs baseline  {status}"
+        print(line)
+    
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {"python": sys.version, "platform": platform.platform(), "results": results},
+                f,
+                indent=2
+            )
+        print(f"Saved baseline to {args.save_baseline}")
+    
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
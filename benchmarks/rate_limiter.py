@@ -0,0 +1,103 @@
+"""Compare the sliding-window and GCRA rate limiting algorithms.
+
+Measures checks per second and state size per key, both against Redis
+(skipped when it is unreachable) and for the in-memory fallback checker.
+
+    python -m benchmarks.rate_limiter --redis-url redis://localhost:6379
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import redis.asyncio as redis
+
+from rate_limiter import (
+    GCRA, SLIDING_WINDOW, MemoryRateLimitChecker, RateLimit, RedisRateLimitChecker
+)
+
+KEY_PREFIX = "bench:rate_limit:"
+
+
+def build_limit(algorithm: str) -> RateLimit:
+    # Generous limit so every request is admitted and the window stays full
+    return RateLimit(requests=1000, window_seconds=60, block_duration_seconds=0, algorithm=algorithm)
+
+
+async def bench_redis(client: redis.Redis, algorithm: str, users: int, requests_per_user: int, concurrency: int) -> None:
+    checker = RedisRateLimitChecker(client)
+    limit = build_limit(algorithm)
+    check = checker.check_redis_gcra if algorithm == GCRA else checker.check_redis_limit
+    keys = [f"{KEY_PREFIX}{algorithm}:{user_id}" for user_id in range(users)]
+    await client.delete(*keys, *[f"blocked:{key}" for key in keys])
+    
+    calls = [key for _ in range(requests_per_user) for key in keys]
+    started = time.perf_counter()
+    for start in range(0, len(calls), concurrency):
+        batch = calls[start:start + concurrency]
+        await asyncio.gather(*(check(key, limit, time.time()) for key in batch))
+    elapsed = time.perf_counter() - started
+    
+    sample = keys[:min(len(keys), 100)]
+    try:
+        usage = [await client.memory_usage(key) or 0 for key in sample]
+        bytes_per_key = f"{sum(usage) / len(usage):>10.0f}"
+    except redis.ResponseError:
+        # MEMORY USAGE is not available on every Redis-compatible server
+        bytes_per_key = f"{'n/a':>10}"
+    print(f"redis   {algorithm:<15} {len(calls) / elapsed:>10.0f} checks/s {bytes_per_key} bytes/key")
+    await client.delete(*keys)
+
+
+def bench_memory(algorithm: str, users: int, requests_per_user: int) -> None:
+    checker = MemoryRateLimitChecker()
+    limit = build_limit(algorithm)
+    keys = [f"{KEY_PREFIX}{algorithm}:{user_id}" for user_id in range(users)]
+    
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(requests_per_user):
+        for key in keys:
+            now = time.time()
+            if algorithm == GCRA:
+                checker.check_memory_gcra(key, limit, now)
+            else:
+                current_time = int(now)
+                checker.check_memory_limit(key, limit, current_time, current_time - limit.window_seconds)
+    elapsed = time.perf_counter() - started
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    print(
+        f"memory  {algorithm:<15} {users * requests_per_user / elapsed:>10.0f} checks/s "
+        f"{allocated / users:>10.0f} bytes/key"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default="redis://localhost:6379")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests-per-user", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    
+    for algorithm in (SLIDING_WINDOW, GCRA):
+        bench_memory(algorithm, args.users, args.requests_per_user)
+    
+    client = redis.from_url(args.redis_url, decode_responses=True, socket_connect_timeout=2)
+    try:
+        await client.ping()
+    except Exception as e:
+        print(f"redis   skipped: {e}")
+        return
+    
+    try:
+        for algorithm in (SLIDING_WINDOW, GCRA):
+            await bench_redis(client, algorithm, args.users, args.requests_per_user, args.concurrency)
+    finally:
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,353 @@
+"""Replay Telegram updates end to end through the bot's Dispatcher.
+
+Feeds updates (synthesized, or replayed from a JSONL file with one Update per
+line) through the Dispatcher built in main.py, with its real middlewares,
+handlers and services. External systems are replaced: a fake Bot API session,
+the bundled fake OpenAI server, and an in-memory user repository. Reports
+throughput and p50/p95/p99 per handler and per stage at each concurrency level.
+
+    python -m benchmarks.replay_updates --updates 500 --concurrency 1,10,50
+    python -m benchmarks.replay_updates --synthesize-to updates.jsonl --updates 1000
+    python -m benchmarks.replay_updates --input updates.jsonl --concurrency 20
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import replace
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.base import BaseSession
+from aiogram.enums import ParseMode
+from aiogram.types import Message, Update
+
+import main
+from benchmarks.fake_openai import FakeOpenAIServer, add_server_arguments, config_from_args
+from benchmarks.stats import format_summary
+from config import settings
+from db.models import User
+from gpt_client import GPTClient, GPTClientFactory
+from gpt_service import GPTService
+from interfaces import ITarotService, IUserRepository, IUserService
+from services import TarotService, UserService
+
+BENCH_TOKEN = "123456789:replay-benchmark-token"
+
+QUESTIONS = [
+    "Что меня ждёт в работе?",
+    "Стоит ли мне переезжать в другой город в этом году?",
+    "Как сложатся отношения с человеком, с которым я недавно познакомилась?",
+    "Я давно думаю о смене профессии, но боюсь потерять стабильный доход. "
+    "Карты, подскажите, готова ли я сейчас к такому шагу и на что обратить внимание?",
+]
+CALLBACKS = ["buy_messages", "invite_friend", "back_to_menu"]
+
+# Per-update stage timings; tasks spawned by a handler inherit the same dict
+_stages: ContextVar[Optional[Dict[str, Any]]] = ContextVar("replay_stages", default=None)
+
+
+def add_stage(name: str, seconds: float) -> None:
+    stages = _stages.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+class FakeBotSession(BaseSession):
+    
+    def __init__(self, latency: float = 0.05):
+        super().__init__()
+        self.latency = latency
+        self._message_ids = itertools.count(10_000)
+        self.calls: Dict[str, int] = {}
+    
+    async def make_request(self, bot: Bot, method, timeout: Optional[int] = None):
+        started = time.perf_counter()
+        name = type(method).__name__
+        self.calls[name] = self.calls.get(name, 0) + 1
+        await asyncio.sleep(self.latency)
+        
+        result: Any = True
+        if Message in getattr(method.__returning__, "__args__", (method.__returning__,)):
+            result = Message.model_validate(
+                {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": getattr(method, "chat_id", None) or 0, "type": "private"},
+                    "text": getattr(method, "text", None) or ""
+                },
+                context={"bot": bot}
+            )
+        
+        add_stage("telegram", time.perf_counter() - started)
+        return result
+    
+    async def close(self) -> None:
+        pass
+    
+    async def stream_content(self, url: str, headers=None, timeout: int = 30, chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+
+class InMemoryUserRepository(IUserRepository):
+    
+    def __init__(self, default_balance: int = 1_000_000, latency: float = 0.001):
+        self.default_balance = default_balance
+        self.latency = latency
+        self._users: Dict[int, User] = {}
+    
+    @asynccontextmanager
+    async def _round_trip(self):
+        started = time.perf_counter()
+        await asyncio.sleep(self.latency)
+        try:
+            yield
+        finally:
+            add_stage("repository", time.perf_counter() - started)
+    
+    async def get_user(self, user_id: int) -> Optional[User]:
+        async with self._round_trip():
+            user = self._users.get(user_id)
+            return replace(user) if user else None
+    
+    async def create_user(self, user_id: int, default_balance: int = 10) -> User:
+        async with self._round_trip():
+            user = self._users.setdefault(user_id, User.create_new(user_id, default_balance=self.default_balance))
+            return replace(user)
+    
+    async def get_or_create_user(self, user_id: int, default_balance: int = 10) -> User:
+        return await self.get_user(user_id) or await self.create_user(user_id, default_balance)
+    
+    async def update_user(self, user: User) -> bool:
+        async with self._round_trip():
+            self._users[user.user_id] = replace(user)
+            return True
+    
+    async def delete_user(self, user_id: int) -> bool:
+        async with self._round_trip():
+            return self._users.pop(user_id, None) is not None
+    
+    async def decrement_balance(self, user_id: int) -> bool:
+        return await self.reserve_balance(user_id) is not None
+    
+    async def reserve_balance(self, user_id: int) -> Optional[int]:
+        async with self._round_trip():
+            user = self._users.get(user_id)
+            if not user or user.balance <= 0:
+                return None
+            user.balance -= 1
+            return user.balance
+    
+    async def increment_balance(self, user_id: int, amount: int = 1) -> Optional[int]:
+        async with self._round_trip():
+            user = self._users.get(user_id)
+            if not user:
+                return None
+            user.balance += amount
+            return user.balance
+    
+    async def add_referral_bonus(self, user_id: int, bonus: int) -> bool:
+        return await self.increment_balance(user_id, bonus) is not None
+
+
+class TimedGPTClient:
+    
+    def __init__(self, client: GPTClient):
+        self._client = client
+        self.reading_budget = client.reading_budget
+    
+    async def create_chat_completion(self, **kwargs):
+        started = time.perf_counter()
+        response = await self._client.create_chat_completion(**kwargs)
+        elapsed = time.perf_counter() - started
+        if kwargs.get("stream"):
+            return self._timed_stream(response, elapsed)
+        add_stage("gpt", elapsed)
+        return response
+    
+    async def _timed_stream(self, stream, elapsed: float) -> AsyncIterator[Any]:
+        # Only time spent waiting on the model counts, not the consumer's work between chunks
+        iterator = stream.__aiter__()
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - started
+                yield chunk
+        finally:
+            add_stage("gpt", elapsed)
+
+
+class ReplayContainer:
+    
+    def __init__(self, user_service: IUserService, tarot_service: ITarotService):
+        self._services = {IUserService: user_service, ITarotService: tarot_service}
+    
+    def get(self, interface):
+        return self._services[interface]
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    
+    async def __call__(self, handler, event, data):
+        stages = _stages.get()
+        started = time.perf_counter()
+        if stages is not None:
+            stages["handler_name"] = data["handler"].callback.__name__
+            stages["before_handler"] = started - stages["started"]
+        try:
+            return await handler(event, data)
+        finally:
+            add_stage("handler", time.perf_counter() - started)
+
+
+def install_handler_timing() -> None:
+    middleware = HandlerTimingMiddleware()
+    for router in main.dp.sub_routers:
+        router.message.middleware(middleware)
+        router.callback_query.middleware(middleware)
+
+
+def synthesize_updates(count: int, users: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    updates = []
+    for update_id in range(1, count + 1):
+        user_id = 100_000 + rng.randrange(users)
+        sender = {"id": user_id, "is_bot": False, "first_name": "Bench"}
+        message = {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": sender
+        }
+        kind = rng.choices(["reading", "start", "callback", "voice"], weights=[60, 10, 20, 10])[0]
+        
+        if kind == "reading":
+            updates.append({"update_id": update_id, "message": {**message, "text": rng.choice(QUESTIONS)}})
+        elif kind == "start":
+            updates.append({"update_id": update_id, "message": {**message, "text": "/start"}})
+        elif kind == "voice":
+            voice = {"file_id": f"voice-{update_id}", "file_unique_id": f"v{update_id}", "duration": 5}
+            updates.append({"update_id": update_id, "message": {**message, "voice": voice}})
+        else:
+            updates.append({
+                "update_id": update_id,
+                "callback_query": {
+                    "id": str(update_id),
+                    "chat_instance": str(user_id),
+                    "from": sender,
+                    "data": rng.choice(CALLBACKS),
+                    "message": {**message, "text": "menu", "from": {"id": 1, "is_bot": True, "first_name": "Arcana"}}
+                }
+            })
+    return updates
+
+
+def load_updates(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def replay(bot: Bot, raw_updates: List[Dict[str, Any]], concurrency: int) -> List[Dict[str, Any]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    results: List[Dict[str, Any]] = []
+    
+    async def feed(raw: Dict[str, Any]) -> None:
+        update = Update.model_validate(raw, context={"bot": bot})
+        async with semaphore:
+            stages = {"started": time.perf_counter(), "handler_name": "unhandled"}
+            _stages.set(stages)
+            try:
+                await main.dp.feed_update(bot, update)
+            except Exception as e:
+                stages["handler_name"] = f"error:{type(e).__name__}"
+            stages["total"] = time.perf_counter() - stages["started"]
+            results.append(stages)
+    
+    await asyncio.gather(*(asyncio.create_task(feed(raw)) for raw in raw_updates))
+    return results
+
+
+def report(results: List[Dict[str, Any]], elapsed: float, concurrency: int) -> None:
+    print(f"\nconcurrency {concurrency}: {len(results)} updates in {elapsed:.2f}s "
+          f"({len(results) / elapsed:.1f} updates/s)")
+    
+    by_handler: Dict[str, List[float]] = {}
+    for result in results:
+        by_handler.setdefault(result["handler_name"], []).append(result["total"])
+    print("  per handler (end to end):")
+    for name, latencies in sorted(by_handler.items()):
+        print(f"    {format_summary(name, latencies, width=28)}")
+    
+    print("  per stage (updates that reached the stage; stages overlap when work runs concurrently):")
+    for stage in ("before_handler", "handler", "repository", "gpt", "telegram"):
+        latencies = [result[stage] for result in results if stage in result]
+        if latencies:
+            print(f"    {format_summary(stage, latencies, width=28)}")
+
+
+async def main_async() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", help="JSONL file with one Telegram Update per line")
+    parser.add_argument("--synthesize-to", help="write synthesized updates to this JSONL file and exit")
+    parser.add_argument("--updates", type=int, default=300, help="number of synthesized updates")
+    parser.add_argument("--users", type=int, default=100, help="distinct synthesized users")
+    parser.add_argument("--concurrency", default="1,10,50", help="comma-separated concurrency levels")
+    parser.add_argument("--telegram-latency-ms", type=float, default=50.0)
+    parser.add_argument("--db-latency-ms", type=float, default=1.0)
+    parser.add_argument(
+        "--edit-interval", type=float, default=settings.bot.STREAM_EDIT_INTERVAL,
+        help="seconds between streamed message edits (BOT_STREAM_EDIT_INTERVAL)"
+    )
+    add_server_arguments(parser)
+    parser.set_defaults(latency_ms=500.0, seed=1)
+    args = parser.parse_args()
+    
+    raw_updates = load_updates(args.input) if args.input else synthesize_updates(args.updates, args.users, args.seed)
+    if args.synthesize_to:
+        with open(args.synthesize_to, "w", encoding="utf-8") as f:
+            for raw in raw_updates:
+                f.write(json.dumps(raw, ensure_ascii=False) + "\n")
+        print(f"Wrote {len(raw_updates)} updates to {args.synthesize_to}")
+        return
+    
+    server = FakeOpenAIServer(config_from_args(args))
+    settings.openai.BASE_URL = await server.start()
+    settings.openai.API_KEY = "fake"
+    settings.bot.STREAM_EDIT_INTERVAL = args.edit_interval
+    
+    session = FakeBotSession(latency=args.telegram_latency_ms / 1000)
+    bot = Bot(token=BENCH_TOKEN, session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    gpt_client = GPTClientFactory.create_gpt_client()
+    install_handler_timing()
+    
+    try:
+        for concurrency in (int(level) for level in args.concurrency.split(",")):
+            # Fresh services per level so queues, breaker and balances start clean
+            repository = InMemoryUserRepository(latency=args.db_latency_ms / 1000)
+            tarot_service = TarotService(settings.tarot, gpt_service=GPTService(client=TimedGPTClient(gpt_client)))
+            main.dp["container"] = ReplayContainer(UserService(repository), tarot_service)
+            
+            started = time.perf_counter()
+            results = await replay(bot, raw_updates, concurrency)
+            report(results, time.perf_counter() - started, concurrency)
+        
+        print(f"\nbot api calls: {session.calls}")
+        print(f"gpt client:    {gpt_client.get_stats()}")
+        print(f"fake openai:   {server.stats}")
+    finally:
+        await gpt_client.close()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async())
@@ -0,0 +1,30 @@
+import math
+from typing import Dict, Sequence
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # Nearest-rank percentile, matching how latency SLOs are usually stated
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: Sequence[float]) -> Dict[str, float]:
+    return {
+        "count": len(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies) if latencies else 0.0
+    }
+
+
+def format_summary(name: str, latencies: Sequence[float], width: int = 24) -> str:
+    stats = summarize(latencies)
+    return (
+        f"{name:<{width}} n={stats['count']:<6} "
+        f"p50={stats['p50'] * 1000:>8.1f}ms p95={stats['p95'] * 1000:>8.1f}ms "
+        f"p99={stats['p99'] * 1000:>8.1f}ms max={stats['max'] * 1000:>8.1f}ms"
+    )
@@ -0,0 +1,156 @@
+"""Compare the single-pass SecurityValidator with its previous implementation.
+
+Times validate+sanitize of 1000-character messages, the batch API and user id
+checks against a verbatim copy of the pattern-per-call validator, and first
+checks that both agree on every input.
+
+    python -m benchmarks.validators
+"""
+import argparse
+import re
+from typing import Callable, List, Optional, Tuple
+
+from benchmarks.micro import MAX_LENGTH_QUESTION, measure
+from validators import SecurityValidator
+
+MAX_LENGTH = SecurityValidator.MAX_MESSAGE_LENGTH
+
+
+class LegacySecurityValidator:
+    
+    SAFE_TEXT_PATTERN = re.compile(
+        r'^[a-zA-Zа-яА-Я0-9\s\.,!?\-_@#$%&*()+=\[\]{}|\\:";\'<>\/\n\r\t]*$'
+    )
+    
+    def validate_user_id(self, user_id: str) -> bool:
+        try:
+            user_id_int = int(user_id)
+            if not (1 <= user_id_int <= 999999999999999):
+                return False
+            return True
+        except (ValueError, TypeError) as e:
+            return False
+    
+    def validate_message_text(self, text: str) -> bool:
+        if not isinstance(text, str):
+            return False
+        
+        if len(text) > MAX_LENGTH:
+            return False
+        
+        if not text.strip():
+            return False
+        
+        dangerous_patterns = [
+            r'<script.*?>.*?</script>',
+            r'javascript:',
+            r'data:text/html',
+            r'vbscript:',
+            r'onload\s*=',
+            r'onerror\s*=',
+            r'onclick\s*=',
+        ]
+        
+        for pattern in dangerous_patterns:
+            if re.search(pattern, text, re.IGNORECASE):
+                return False
+        
+        if not self.SAFE_TEXT_PATTERN.match(text):
+            return False
+        
+        return True
+    
+    def sanitize_text(self, text: str) -> str:
+        if not isinstance(text, str):
+            return ""
+        
+        text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', text)
+        
+        text = text[:MAX_LENGTH]
+        
+        text = text.strip()
+        
+        return text
+
+
+def fit(text: str) -> str:
+    return (text * (MAX_LENGTH // len(text) + 1))[:MAX_LENGTH]
+
+
+INPUTS = {
+    "russian": MAX_LENGTH_QUESTION,
+    "english": fit("Should I accept the new job offer, or wait until spring for a better one? "),
+    "punctuated": fit("Вопрос: стоит ли (сейчас) менять работу = 50/50? Ответ <да/нет> "),
+    "markup_at_end": MAX_LENGTH_QUESTION[:980] + "<script>x</script>",
+    "event_handler": fit("Картинка onload = "),
+    "control_chars": fit("Вопрос\x0bо работе\x1f и деньгах "),
+    "unsafe_chars": MAX_LENGTH_QUESTION[:999] + "☺",
+}
+
+EDGE_CASES = [
+    "", "   ", "\x0b\x1c", "ok", "JavaScript:alert(1)", "DATA:TEXT/HTML,x", "on\nclick=1",
+    "<SCRIPT src=x>\n</script>", "<script>x</script>", "onerror  =", "a" * (MAX_LENGTH + 1),
+    "вопрос с неразрывным пробелом", "Привет!\r\n\tКак дела?", None, 42,
+]
+
+
+def legacy_clean(validator: LegacySecurityValidator, text) -> Optional[str]:
+    if not validator.validate_message_text(text):
+        return None
+    return validator.sanitize_text(text)
+
+
+def check_equivalence(legacy: LegacySecurityValidator, current: SecurityValidator) -> None:
+    for text in list(INPUTS.values()) + EDGE_CASES:
+        expected = legacy_clean(legacy, text)
+        actual = current.clean_message_text(text)
+        if expected != actual:
+            raise SystemExit(f"Validators disagree on {text!r}: legacy={expected!r} current={actual!r}")
+    for user_id in (0, 1, 123456789, 10 ** 15, -5, True, False):
+        if legacy.validate_user_id(str(user_id)) != current.validate_user_id(user_id):
+            raise SystemExit(f"Validators disagree on user id {user_id}")
+
+
+def cases(legacy: LegacySecurityValidator, current: SecurityValidator, batch: int) -> List[Tuple[str, Callable, Callable]]:
+    result = []
+    for name, text in INPUTS.items():
+        result.append((
+            f"validate+sanitize[{name}]",
+            lambda text=text: legacy_clean(legacy, text),
+            lambda text=text: current.clean_message_text(text)
+        ))
+    
+    texts = [INPUTS["russian"]] * batch
+    result.append((
+        f"batch[{batch} x russian]",
+        lambda: [legacy.validate_message_text(text) for text in texts],
+        lambda: current.validate_message_texts(texts)
+    ))
+    result.append((
+        "validate_user_id",
+        lambda: legacy.validate_user_id(str(123456789)),
+        lambda: current.validate_user_id(123456789)
+    ))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1, help="seconds per timed run")
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+    
+    legacy = LegacySecurityValidator()
+    current = SecurityValidator()
+    check_equivalence(legacy, current)
+    
+    print(f"{'case':<32} {'legacy ns/op':>14} {'current ns/op':>14} {'speedup':>8}")
+    for name, legacy_func, current_func in cases(legacy, current, args.batch):
+        before = measure(legacy_func, False, args.repeat, args.min_time)
+        after = measure(current_func, False, args.repeat, args.min_time)
+        print(f"{name:<32} {before * 1e9:>14.0f} {after * 1e9:>14.0f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,19 @@
+import re
+import sys
 import json
+import math
+import heapq
+import time
+import uuid
+import random
+import hashlib
 import asyncio
-from typing import Any, Optional, Dict
-from datetime import datetime, timedelta
+import fnmatch
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Dict, List, Set, Tuple
 import redis.asyncio as redis
 from functools import wraps
+from cache_codecs import ValueSerializer
 
 
 class CacheConfig:
@@ -11,20 +21,145 @@ class CacheConfig:
     def __init__(self):
         self.default_ttl = 3600
         self.key_prefix = "arcana_bot:"
+        self.local_max_entries = 10000
+        self.local_default_ttl = 60
+        # In-process TTL per key family (the part of the key before the first ':')
+        self.local_ttls = {
+            "tarot_cards": 3600,
+            "user": 30,
+        }
+        self.invalidation_channel = f"{self.key_prefix}cache:invalidate"
+        # XFetch early refresh aggressiveness; 0 disables early refresh
+        self.xfetch_beta = 1.0
+        self.lock_timeout = 30
+        self.lock_wait_timeout = 10
+        self.memory_max_entries = 10000
+        self.memory_max_bytes = 64 * 1024 * 1024
+        self.memory_sweep_interval = 30
+        # Encoding used for new Redis writes; existing entries stay readable after a change
+        self.codec = "json"
+        self.compression = "zlib"
+        self.compression_threshold = 1024
+        self.batch_size = 500
+
+
+class CacheStats:
+    
+    def __init__(self):
+        self._counters: Dict[str, Dict[str, int]] = {}
+    
+    def hit(self, tier: str) -> None:
+        self._counter(tier)["hits"] += 1
+    
+    def miss(self, tier: str) -> None:
+        self._counter(tier)["misses"] += 1
+    
+    def _counter(self, tier: str) -> Dict[str, int]:
+        if tier not in self._counters:
+            self._counters[tier] = {"hits": 0, "misses": 0}
+        return self._counters[tier]
+    
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {tier: dict(counter) for tier, counter in self._counters.items()}
+
+
+class LocalCache:
+    
+    def __init__(self, config: CacheConfig):
+        self.config = config
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        # key -> [version, fills in flight]; kept only while a Redis read for the key is pending
+        self._versions: Dict[str, List[int]] = {}
+    
+    def ttl_for(self, key: str, ttl: Optional[int] = None) -> int:
+        family = key.split(":", 1)[0]
+        local_ttl = self.config.local_ttls.get(family, self.config.local_default_ttl)
+        if ttl:
+            local_ttl = min(local_ttl, ttl)
+        return local_ttl
+    
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        self._bump(key)
+        self._store(key, value, ttl)
+    
+    def _store(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        local_ttl = self.ttl_for(key, ttl)
+        if local_ttl <= 0:
+            self._entries.pop(key, None)
+            return
+        
+        self._entries[key] = (value, time.monotonic() + local_ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.config.local_max_entries:
+            self._entries.popitem(last=False)
+    
+    def delete(self, key: str) -> bool:
+        self._bump(key)
+        return self._entries.pop(key, None) is not None
+    
+    def clear_pattern(self, pattern: str) -> int:
+        for key in self._versions:
+            if fnmatch.fnmatchcase(key, pattern):
+                self._bump(key)
+        keys = [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+    
+    def clear(self) -> None:
+        for key in self._versions:
+            self._bump(key)
+        self._entries.clear()
+    
+    def begin_fill(self, key: str) -> int:
+        entry = self._versions.setdefault(key, [0, 0])
+        entry[1] += 1
+        return entry[0]
+    
+    def finish_fill(self, key: str, version: int, value: Any = None) -> None:
+        # A set, delete or invalidation during the Redis read means the value read may be stale
+        entry = self._versions[key]
+        if value is not None and entry[0] == version:
+            self._store(key, value)
+        entry[1] -= 1
+        if not entry[1]:
+            del self._versions[key]
+    
+    def _bump(self, key: str) -> None:
+        entry = self._versions.get(key)
+        if entry is not None:
+            entry[0] += 1
+    
+    def __len__(self) -> int:
+        return len(self._entries)
 
 
 class RedisCacheOperations:
     
-    def __init__(self, redis_client: redis.Redis, config: CacheConfig):
+    def __init__(self, redis_client: redis.Redis, config: CacheConfig, serializer: ValueSerializer):
         self.redis_client = redis_client
         self.config = config
+        self.serializer = serializer
     
     async def get(self, key: str) -> Optional[Any]:
         full_key = f"{self.config.key_prefix}{key}"
         try:
             value = await self.redis_client.get(full_key)
             if value:
-                return json.loads(value)
+                return self.serializer.loads(value)
             return None
         except Exception as e:
             return None
@@ -33,7 +168,7 @@ class RedisCacheOperations:
         full_key = f"{self.config.key_prefix}{key}"
         ttl = ttl or self.config.default_ttl
         try:
-            serialized_value = json.dumps(value, default=str)
+            serialized_value = self.serializer.dumps(value)
             await self.redis_client.setex(full_key, ttl, serialized_value)
             return True
         except Exception as e:
@@ -46,39 +181,255 @@ class RedisCacheOperations:
             return result > 0
         except Exception as e:
             return False
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for chunk in _chunks(keys, self.config.batch_size):
+                pipe.mget([f"{self.config.key_prefix}{key}" for key in chunk])
+            replies = await pipe.execute()
+        except Exception as e:
+            return {}
+        
+        values = {}
+        raw_values = [value for reply in replies for value in reply]
+        for key, raw_value in zip(keys, raw_values):
+            if raw_value:
+                try:
+                    values[key] = self.serializer.loads(raw_value)
+                except Exception as e:
+                    continue
+        return values
+    
+    async def set_many(self, items: Dict[str, Any], ttls: Dict[str, int]) -> bool:
+        if not items:
+            return True
+        
+        try:
+            for chunk in _chunks(list(items), self.config.batch_size):
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key in chunk:
+                    pipe.setex(
+                        f"{self.config.key_prefix}{key}",
+                        ttls[key],
+                        self.serializer.dumps(items[key])
+                    )
+                await pipe.execute()
+            return True
+        except Exception as e:
+            return False
+    
+    async def clear_pattern(
+        self,
+        pattern: str,
+        batch_size: int,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> int:
+        full_pattern = f"{self.config.key_prefix}{pattern}"
+        cursor = 0
+        pending: List[Any] = []
+        scanned = 0
+        deleted = 0
+        
+        while True:
+            # Unlink the previous page and fetch the next one in a single round trip
+            pipe = self.redis_client.pipeline(transaction=False)
+            if pending:
+                pipe.unlink(*pending)
+            pipe.scan(cursor, match=full_pattern, count=batch_size)
+            results = await pipe.execute()
+            
+            if pending:
+                deleted += results[0]
+            cursor, pending = results[-1]
+            scanned += len(pending)
+            
+            if progress:
+                progress(deleted, scanned)
+            
+            if cursor == 0:
+                break
+        
+        if pending:
+            deleted += await self.redis_client.unlink(*pending)
+            if progress:
+                progress(deleted, scanned)
+        return deleted
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        if not keys:
+            return 0
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for chunk in _chunks(keys, self.config.batch_size):
+                pipe.delete(*[f"{self.config.key_prefix}{key}" for key in chunk])
+            return sum(await pipe.execute())
+        except Exception as e:
+            return 0
+
+
+def _chunks(items: List[Any], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
 
 class MemoryCacheOperations:
     
     def __init__(self, config: CacheConfig):
         self.config = config
-        self._memory_cache: Dict[str, Dict] = {}
+        # full_key -> (value, expires_at on the monotonic clock, approximate size in bytes)
+        self._memory_cache: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._families: Dict[str, Set[str]] = {}
+        self._total_bytes = 0
+        self._sweeper_task: Optional[asyncio.Task] = None
     
     async def get(self, key: str) -> Optional[Any]:
         full_key = f"{self.config.key_prefix}{key}"
-        if full_key in self._memory_cache:
-            cache_entry = self._memory_cache[full_key]
-            if cache_entry["expires_at"] > datetime.now():
-                return cache_entry["value"]
-            else:
-                del self._memory_cache[full_key]
-        return None
+        entry = self._memory_cache.get(full_key)
+        if entry is None:
+            return None
+        
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(full_key)
+            return None
+        
+        self._memory_cache.move_to_end(full_key)
+        return value
     
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
         full_key = f"{self.config.key_prefix}{key}"
         ttl = ttl or self.config.default_ttl
-        self._memory_cache[full_key] = {
-            "value": value,
-            "expires_at": datetime.now() + timedelta(seconds=ttl)
-        }
+        size = self._estimate_size(full_key, value)
+        self._remove(full_key)
+        if size > self.config.memory_max_bytes:
+            return False
+        
+        expires_at = time.monotonic() + ttl
+        self._memory_cache[full_key] = (value, expires_at, size)
+        self._total_bytes += size
+        self._families.setdefault(self._family(full_key), set()).add(full_key)
+        heapq.heappush(self._expiry_heap, (expires_at, full_key))
+        
+        self.sweep_expired(limit=8)
+        while (
+            len(self._memory_cache) > self.config.memory_max_entries
+            or self._total_bytes > self.config.memory_max_bytes
+        ):
+            oldest_key = next(iter(self._memory_cache))
+            self._remove(oldest_key)
         return True
     
     async def delete(self, key: str) -> bool:
         full_key = f"{self.config.key_prefix}{key}"
-        if full_key in self._memory_cache:
-            del self._memory_cache[full_key]
-            return True
-        return False
+        return self._remove(full_key)
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        values = {}
+        for key in keys:
+            value = await self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+    
+    async def set_many(self, items: Dict[str, Any], ttls: Dict[str, int]) -> bool:
+        results = [await self.set(key, value, ttls[key]) for key, value in items.items()]
+        return all(results)
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        return sum(self._remove(f"{self.config.key_prefix}{key}") for key in keys)
+    
+    def clear_pattern(self, pattern: str) -> int:
+        full_pattern = f"{self.config.key_prefix}{pattern}"
+        literal_prefix = re.split(r"[*?\[]", pattern, 1)[0]
+        
+        if ":" in literal_prefix:
+            candidates = list(self._families.get(literal_prefix.split(":", 1)[0], ()))
+        else:
+            candidates = [
+                key
+                for family, keys in self._families.items() if family.startswith(literal_prefix)
+                for key in keys
+            ]
+        
+        keys_to_delete = [key for key in candidates if fnmatch.fnmatchcase(key, full_pattern)]
+        for key in keys_to_delete:
+            self._remove(key)
+        return len(keys_to_delete)
+    
+    def sweep_expired(self, limit: Optional[int] = None) -> int:
+        now = time.monotonic()
+        removed = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            if limit is not None and removed >= limit:
+                break
+            expires_at, full_key = heapq.heappop(self._expiry_heap)
+            entry = self._memory_cache.get(full_key)
+            # Skip heap entries left behind by a later set() of the same key
+            if entry is not None and entry[1] == expires_at:
+                self._remove(full_key)
+                removed += 1
+        
+        if len(self._expiry_heap) > 2 * len(self._memory_cache) + 64:
+            self._expiry_heap = [
+                (entry[1], full_key) for full_key, entry in self._memory_cache.items()
+            ]
+            heapq.heapify(self._expiry_heap)
+        return removed
+    
+    async def _run_sweeper(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.memory_sweep_interval)
+            self.sweep_expired()
+    
+    def start_sweeper(self) -> None:
+        if self._sweeper_task is None:
+            self._sweeper_task = asyncio.create_task(self._run_sweeper())
+    
+    async def stop_sweeper(self) -> None:
+        if self._sweeper_task:
+            self._sweeper_task.cancel()
+            try:
+                await self._sweeper_task
+            except asyncio.CancelledError:
+                pass
+            self._sweeper_task = None
+    
+    def _remove(self, full_key: str) -> bool:
+        entry = self._memory_cache.pop(full_key, None)
+        if entry is None:
+            return False
+        
+        self._total_bytes -= entry[2]
+        family = self._family(full_key)
+        keys = self._families.get(family)
+        if keys is not None:
+            keys.discard(full_key)
+            if not keys:
+                del self._families[family]
+        return True
+    
+    def _family(self, full_key: str) -> str:
+        return full_key[len(self.config.key_prefix):].split(":", 1)[0]
+    
+    @staticmethod
+    def _estimate_size(full_key: str, value: Any) -> int:
+        try:
+            return len(full_key) + len(json.dumps(value, default=str))
+        except (TypeError, ValueError) as e:
+            return len(full_key) + sys.getsizeof(value)
+    
+    @property
+    def size_bytes(self) -> int:
+        return self._total_bytes
+    
+    def __len__(self) -> int:
+        return len(self._memory_cache)
 
 
 class CacheManager:
@@ -89,31 +440,118 @@ class CacheManager:
         self.config = CacheConfig()
         self.redis_ops: Optional[RedisCacheOperations] = None
         self.memory_ops = MemoryCacheOperations(self.config)
+        self.serializer = ValueSerializer(
+            self.config.codec,
+            self.config.compression,
+            self.config.compression_threshold
+        )
+        self.local_cache = LocalCache(self.config)
+        self.stats = CacheStats()
+        self._instance_id = uuid.uuid4().hex
+        self._invalidation_task: Optional[asyncio.Task] = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._background_tasks: Set[asyncio.Task] = set()
     
     async def initialize(self):
         try:
             self.redis_client = redis.from_url(
                 self.redis_url,
                 encoding="utf-8",
-                decode_responses=True,
+                decode_responses=False,
                 socket_connect_timeout=5,
                 socket_timeout=5,
                 retry_on_timeout=True
             )
             
             await self.redis_client.ping()
-            self.redis_ops = RedisCacheOperations(self.redis_client, self.config)
+            self.redis_ops = RedisCacheOperations(self.redis_client, self.config, self.serializer)
+            self._invalidation_task = asyncio.create_task(self._listen_invalidations())
             
         except Exception as e:
             self.redis_client = None
             self.redis_ops = None
+            self.memory_ops.start_sweeper()
+    
+    async def _listen_invalidations(self) -> None:
+        while True:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.config.invalidation_channel)
+                # Invalidations may have been missed while unsubscribed
+                self.local_cache.clear()
+                async for message in pubsub.listen():
+                    self._apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.local_cache.clear()
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception as e:
+                    pass
+    
+    def _apply_invalidation(self, data: bytes) -> None:
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError) as e:
+            return
+        
+        if message.get("origin") == self._instance_id:
+            return
+        
+        if "key" in message:
+            self.local_cache.delete(message["key"])
+        elif "keys" in message:
+            for key in message["keys"]:
+                self.local_cache.delete(key)
+        elif "pattern" in message:
+            self.local_cache.clear_pattern(message["pattern"])
+    
+    async def _publish_invalidation(self, **payload) -> None:
+        try:
+            await self.redis_client.publish(
+                self.config.invalidation_channel,
+                json.dumps({"origin": self._instance_id, **payload})
+            )
+        except Exception as e:
+            pass
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats.snapshot()
+        stats["local_size"] = len(self.local_cache)
+        return stats
     
     async def get(self, key: str) -> Optional[Any]:
         try:
             if self.redis_ops:
-                return await self.redis_ops.get(key)
+                value = self.local_cache.get(key)
+                if value is not None:
+                    self.stats.hit("local")
+                    return value
+                self.stats.miss("local")
+                
+                version = self.local_cache.begin_fill(key)
+                value = None
+                try:
+                    value = await self.redis_ops.get(key)
+                finally:
+                    self.local_cache.finish_fill(key, version, value)
+                
+                if value is None:
+                    self.stats.miss("redis")
+                    return None
+                
+                self.stats.hit("redis")
+                return value
             else:
-                return await self.memory_ops.get(key)
+                value = await self.memory_ops.get(key)
+                if value is None:
+                    self.stats.miss("memory")
+                else:
+                    self.stats.hit("memory")
+                return value
         except Exception as e:
             return None
     
@@ -125,7 +563,13 @@ class CacheManager:
     ) -> bool:
         try:
             if self.redis_ops:
-                return await self.redis_ops.set(key, value, ttl)
+                result = await self.redis_ops.set(key, value, ttl)
+                if result:
+                    self.local_cache.set(key, value, ttl)
+                else:
+                    self.local_cache.delete(key)
+                await self._publish_invalidation(key=key)
+                return result
             else:
                 return await self.memory_ops.set(key, value, ttl)
         except Exception as e:
@@ -134,17 +578,100 @@ class CacheManager:
     async def delete(self, key: str) -> bool:
         try:
             if self.redis_ops:
-                return await self.redis_ops.delete(key)
+                result = await self.redis_ops.delete(key)
+                self.local_cache.delete(key)
+                await self._publish_invalidation(key=key)
+                return result
             else:
                 return await self.memory_ops.delete(key)
         except Exception as e:
             return False
     
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(keys))
+        try:
+            if not self.redis_ops:
+                values = await self.memory_ops.get_many(keys)
+                for _ in values:
+                    self.stats.hit("memory")
+                for _ in range(len(keys) - len(values)):
+                    self.stats.miss("memory")
+                return values
+            
+            values = {}
+            missing = []
+            for key in keys:
+                value = self.local_cache.get(key)
+                if value is None:
+                    self.stats.miss("local")
+                    missing.append(key)
+                else:
+                    self.stats.hit("local")
+                    values[key] = value
+            
+            versions = {key: self.local_cache.begin_fill(key) for key in missing}
+            fetched = {}
+            try:
+                fetched = await self.redis_ops.get_many(missing)
+            finally:
+                for key, version in versions.items():
+                    self.local_cache.finish_fill(key, version, fetched.get(key))
+            
+            for key in missing:
+                if key in fetched:
+                    self.stats.hit("redis")
+                else:
+                    self.stats.miss("redis")
+            values.update(fetched)
+            return values
+        except Exception as e:
+            return {}
+    
+    async def set_many(
+        self,
+        items: Dict[str, Any],
+        ttl: Optional[int] = None,
+        ttls: Optional[Dict[str, int]] = None
+    ) -> bool:
+        ttls = {
+            key: (ttls or {}).get(key) or ttl or self.config.default_ttl
+            for key in items
+        }
+        try:
+            if self.redis_ops:
+                result = await self.redis_ops.set_many(items, ttls)
+                for key, value in items.items():
+                    if result:
+                        self.local_cache.set(key, value, ttls[key])
+                    else:
+                        self.local_cache.delete(key)
+                await self._publish_invalidation(keys=list(items))
+                return result
+            else:
+                return await self.memory_ops.set_many(items, ttls)
+        except Exception as e:
+            return False
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        try:
+            if self.redis_ops:
+                deleted = await self.redis_ops.delete_many(keys)
+                for key in keys:
+                    self.local_cache.delete(key)
+                await self._publish_invalidation(keys=list(keys))
+                return deleted
+            else:
+                return await self.memory_ops.delete_many(keys)
+        except Exception as e:
+            return 0
+    
     async def exists(self, key: str) -> bool:
         full_key = f"{self.config.key_prefix}{key}"
         
         try:
             if self.redis_client:
+                if self.local_cache.get(key) is not None:
+                    return True
                 return await self.redis_client.exists(full_key) > 0
             else:
                 return await self.memory_ops.get(key) is not None
@@ -152,68 +679,166 @@ class CacheManager:
         except Exception as e:
             return False
     
-    async def clear_pattern(self, pattern: str) -> int:
-        full_pattern = f"{self.config.key_prefix}{pattern}"
-        
+    async def clear_pattern(
+        self,
+        pattern: str,
+        batch_size: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> int:
         try:
-            if self.redis_client:
-                keys = await self.redis_client.keys(full_pattern)
-                if keys:
-                    return await self.redis_client.delete(*keys)
+            if self.redis_ops:
+                deleted = await self.redis_ops.clear_pattern(
+                    pattern, batch_size or self.config.batch_size, progress
+                )
+                self.local_cache.clear_pattern(pattern)
+                await self._publish_invalidation(pattern=pattern)
+                return deleted
             else:
-                keys_to_delete = [
-                    key for key in self.memory_ops._memory_cache.keys() 
-                    if key.startswith(full_pattern.replace("*", ""))
-                ]
-                for key in keys_to_delete:
-                    del self.memory_ops._memory_cache[key]
-                return len(keys_to_delete)
-            
-            return 0
+                return self.memory_ops.clear_pattern(pattern)
             
         except Exception as e:
             return 0
     
+    def clear_pattern_in_background(
+        self,
+        pattern: str,
+        batch_size: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> asyncio.Task:
+        task = asyncio.create_task(self.clear_pattern(pattern, batch_size, progress))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+    
     async def get_or_set(
         self, 
         key: str, 
         factory_func, 
-        ttl: Optional[int] = None
+        ttl: Optional[int] = None,
+        distributed_lock: bool = False
     ) -> Any:
-        value = await self.get(key)
-        if value is not None:
-            return value
+        ttl = ttl or self.config.default_ttl
+        
+        cached_value = await self.get(key)
+        if self._is_envelope(cached_value):
+            if self._should_refresh_early(cached_value):
+                self._refresh_in_background(key, factory_func, ttl, distributed_lock)
+            return cached_value["value"]
+        if cached_value is not None:
+            return cached_value
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._start_compute(key, factory_func, ttl, distributed_lock)
+        # Shielded so a cancelled caller does not cancel the shared computation
+        return await asyncio.shield(task)
+    
+    def _start_compute(self, key: str, factory_func, ttl: int, distributed_lock: bool) -> asyncio.Task:
+        task = asyncio.create_task(self._compute(key, factory_func, ttl, distributed_lock))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+    
+    def _refresh_in_background(self, key: str, factory_func, ttl: int, distributed_lock: bool) -> None:
+        if key in self._inflight:
+            return
+        task = self._start_compute(key, factory_func, ttl, distributed_lock)
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    
+    async def _compute(self, key: str, factory_func, ttl: int, distributed_lock: bool) -> Any:
+        if not (distributed_lock and self.redis_client):
+            return await self._compute_and_store(key, factory_func, ttl)
         
+        lock = self.redis_client.lock(
+            f"{self.config.key_prefix}lock:{key}",
+            timeout=self.config.lock_timeout,
+            blocking_timeout=self.config.lock_wait_timeout
+        )
+        acquired = False
+        try:
+            acquired = await lock.acquire()
+        except Exception as e:
+            pass
+        
+        try:
+            if acquired:
+                # Another replica may have filled the key while we waited for the lock
+                cached_value = await self.get(key)
+                if self._is_envelope(cached_value) and not self._should_refresh_early(cached_value):
+                    return cached_value["value"]
+            return await self._compute_and_store(key, factory_func, ttl)
+        finally:
+            if acquired:
+                try:
+                    await lock.release()
+                except Exception as e:
+                    pass
+    
+    async def _compute_and_store(self, key: str, factory_func, ttl: int) -> Any:
+        started = time.monotonic()
         if asyncio.iscoroutinefunction(factory_func):
             value = await factory_func()
         else:
             value = factory_func()
+        delta = time.monotonic() - started
         
-        await self.set(key, value, ttl)
+        await self.set(key, {
+            "__xfetch__": True,
+            "value": value,
+            "delta": delta,
+            "expires_at": time.time() + ttl
+        }, ttl)
         return value
     
+    @staticmethod
+    def _is_envelope(value: Any) -> bool:
+        return isinstance(value, dict) and value.get("__xfetch__") is True
+    
+    def _should_refresh_early(self, envelope: Dict) -> bool:
+        if self.config.xfetch_beta <= 0:
+            return False
+        # XFetch: recompute with a probability that grows as expiry approaches,
+        # scaled by how long the value took to compute last time
+        gap = envelope["delta"] * self.config.xfetch_beta * -math.log(1.0 - random.random())
+        return time.time() + gap >= envelope["expires_at"]
+    
     async def close(self):
+        if self._invalidation_task:
+            self._invalidation_task.cancel()
+            try:
+                await self._invalidation_task
+            except asyncio.CancelledError:
+                pass
+            self._invalidation_task = None
+        for task in list(self._inflight.values()) + list(self._background_tasks):
+            task.cancel()
+        await self.memory_ops.stop_sweeper()
+        self.local_cache.clear()
         if self.redis_client:
             await self.redis_client.close()
 
 
-def cached(cache_manager: CacheManager, ttl: int = 3600, key_prefix: str = ""):
+def cached(
+    cache_manager: CacheManager,
+    ttl: int = 3600,
+    key_prefix: str = "",
+    distributed_lock: bool = False
+):
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            cache_key = f"{key_prefix}{func.__name__}:{hash(str(args) + str(kwargs))}"
-            
-            cached_value = await cache_manager.get(cache_key)
-            if cached_value is not None:
-                return cached_value
+            # hashlib rather than hash() so every replica derives the same key
+            args_hash = hashlib.sha1((str(args) + str(kwargs)).encode()).hexdigest()
+            cache_key = f"{key_prefix}{func.__name__}:{args_hash}"
             
-            if asyncio.iscoroutinefunction(func):
-                result = await func(*args, **kwargs)
-            else:
-                result = func(*args, **kwargs)
+            async def factory():
+                if asyncio.iscoroutinefunction(func):
+                    return await func(*args, **kwargs)
+                return func(*args, **kwargs)
             
-            await cache_manager.set(cache_key, result, ttl)
-            return result
+            return await cache_manager.get_or_set(
+                cache_key, factory, ttl, distributed_lock=distributed_lock
+            )
         
         return wrapper
     return decorator
@@ -0,0 +1,194 @@
+import json
+import zlib
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+# Every encoded value starts with MAGIC, a codec id and a compression id, so
+# readers can decode entries written with any codec. JSON text never starts
+# with a NUL byte, which keeps values written before the header was
+# introduced readable.
+MAGIC = b"\x00"
+HEADER_SIZE = 3
+
+
+def _encode_default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return {"__datetime__": obj.isoformat()}
+    if isinstance(obj, date):
+        return {"__date__": obj.isoformat()}
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    return str(obj)
+
+
+def _decode_hook(obj: Dict) -> Any:
+    if len(obj) == 1:
+        if "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+        if "__date__" in obj:
+            return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+class JsonCodec:
+    
+    codec_id = 1
+    name = "json"
+    
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, default=_encode_default, ensure_ascii=False).encode("utf-8")
+    
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data, object_hook=_decode_hook)
+
+
+class OrjsonCodec:
+    
+    codec_id = 2
+    name = "orjson"
+    
+    def encode(self, value: Any) -> bytes:
+        return orjson.dumps(
+            value,
+            default=_encode_default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        )
+    
+    def decode(self, data: bytes) -> Any:
+        value = orjson.loads(data)
+        if b'"__date' not in data:
+            return value
+        return _restore_tagged(value)
+
+
+class MsgpackCodec:
+    
+    codec_id = 3
+    name = "msgpack"
+    
+    def encode(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=_encode_default, use_bin_type=True, datetime=False)
+    
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, object_hook=_decode_hook, strict_map_key=False)
+
+
+def _restore_tagged(value: Any) -> Any:
+    if isinstance(value, dict):
+        return _decode_hook({key: _restore_tagged(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_restore_tagged(item) for item in value]
+    return value
+
+
+class ZlibCompressor:
+    
+    compression_id = 1
+    name = "zlib"
+    
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, 6)
+    
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class Lz4Compressor:
+    
+    compression_id = 2
+    name = "lz4"
+    
+    def compress(self, data: bytes) -> bytes:
+        return lz4_frame.compress(data)
+    
+    def decompress(self, data: bytes) -> bytes:
+        return lz4_frame.decompress(data)
+
+
+def available_codecs() -> Dict[str, Any]:
+    codecs = {"json": JsonCodec()}
+    if orjson is not None:
+        codecs["orjson"] = OrjsonCodec()
+    if msgpack is not None:
+        codecs["msgpack"] = MsgpackCodec()
+    return codecs
+
+
+def available_compressors() -> Dict[str, Any]:
+    compressors = {"zlib": ZlibCompressor()}
+    if lz4_frame is not None:
+        compressors["lz4"] = Lz4Compressor()
+    return compressors
+
+
+class ValueSerializer:
+    
+    def __init__(
+        self,
+        codec: str = "json",
+        compression: Optional[str] = "zlib",
+        compression_threshold: int = 1024
+    ):
+        codecs = available_codecs()
+        compressors = available_compressors()
+        if codec not in codecs:
+            raise ValueError(f"Cache codec is not available: {codec}")
+        if compression and compression not in compressors:
+            raise ValueError(f"Cache compression is not available: {compression}")
+        
+        self.codec = codecs[codec]
+        self.compressor = compressors[compression] if compression else None
+        self.compression_threshold = compression_threshold
+        self._codecs_by_id = {item.codec_id: item for item in codecs.values()}
+        self._compressors_by_id = {item.compression_id: item for item in compressors.values()}
+    
+    def dumps(self, value: Any) -> bytes:
+        payload = self.codec.encode(value)
+        compression_id = 0
+        if self.compressor and len(payload) >= self.compression_threshold:
+            compressed = self.compressor.compress(payload)
+            if len(compressed) < len(payload):
+                payload = compressed
+                compression_id = self.compressor.compression_id
+        
+        return MAGIC + bytes((self.codec.codec_id, compression_id)) + payload
+    
+    def loads(self, data: bytes) -> Any:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        
+        if not data.startswith(MAGIC):
+            # Written before values carried a header
+            return json.loads(data)
+        
+        codec_id, compression_id = data[1], data[2]
+        payload = data[HEADER_SIZE:]
+        if compression_id:
+            compressor = self._compressors_by_id.get(compression_id)
+            if compressor is None:
+                raise ValueError(f"Unknown cache compression id: {compression_id}")
+            payload = compressor.decompress(payload)
+        
+        codec = self._codecs_by_id.get(codec_id)
+        if codec is None:
+            raise ValueError(f"Unknown cache codec id: {codec_id}")
+        return codec.decode(payload)
@@ -0,0 +1,126 @@
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+@dataclass
+class GuardedCall:
+    # Set by callers that time the upstream themselves; None falls back to wall-clock time
+    slow: Optional[bool] = None
+
+
+class CircuitBreaker:
+    
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 15.0,
+        window_size: int = 20,
+        min_calls: int = 5,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        # True marks a failed or too slow call
+        self._outcomes: Deque[bool] = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.times_opened = 0
+        self.short_circuited = 0
+    
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            return HALF_OPEN
+        return self._state
+    
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+    
+    @asynccontextmanager
+    async def guard(self):
+        probe = self._acquire()
+        started = time.monotonic()
+        call = GuardedCall()
+        try:
+            yield call
+        except Exception:
+            self._record(probe, failed=True)
+            raise
+        except BaseException:
+            # A cancelled probe says nothing about the upstream
+            if probe:
+                self._probes -= 1
+            raise
+        else:
+            slow = call.slow
+            if slow is None:
+                slow = time.monotonic() - started >= self.slow_call_seconds
+            self._record(probe, failed=slow)
+    
+    def _acquire(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return False
+        
+        if state == HALF_OPEN and self._probes < self.half_open_max_calls:
+            self._state = HALF_OPEN
+            self._probes += 1
+            return True
+        
+        self.short_circuited += 1
+        raise CircuitOpenError(f"Circuit is {state}")
+    
+    def _record(self, probe: bool, failed: bool) -> None:
+        if probe:
+            self._probes -= 1
+            if failed:
+                self._open()
+            elif self._state == HALF_OPEN:
+                self._close()
+            return
+        
+        # Late results from calls started before the circuit opened are ignored
+        if self._state != CLOSED:
+            return
+        
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_calls:
+            failure_rate = sum(self._outcomes) / len(self._outcomes)
+            if failure_rate >= self.failure_rate_threshold:
+                self._open()
+    
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.times_opened += 1
+    
+    def _close(self) -> None:
+        self._state = CLOSED
+        self._outcomes.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "recent_calls": len(self._outcomes),
+            "recent_failures": sum(self._outcomes),
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited
+        }
@@ -0,0 +1,247 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from aiogram import BaseMiddleware, Bot
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.types import TelegramObject, Update
+from messages import BotMessages
+
+logger = logging.getLogger(__name__)
+
+QueuedCallback = Callable[[], Awaitable[None]]
+
+LANE_INTERACTIVE = "interactive"
+LANE_READING = "reading"
+LANE_VOICE = "voice"
+
+# Commands with a handler of their own; any other text, slash or not, reaches the reading handler
+INTERACTIVE_COMMANDS = frozenset({"start"})
+
+
+def classify_update(update: TelegramObject) -> str:
+    message = update.message if isinstance(update, Update) else None
+    if message is not None:
+        if message.voice is not None:
+            return LANE_VOICE
+        if message.text and not _is_interactive_command(message.text):
+            return LANE_READING
+    # Registered commands, callbacks and everything else are cheap
+    return LANE_INTERACTIVE
+
+
+def _is_interactive_command(text: str) -> bool:
+    if not text.startswith("/"):
+        return False
+    # "/start@BotName payload" -> "start", matched case-sensitively like aiogram's Command filter
+    command = text.split(maxsplit=1)[0][1:]
+    return command.split("@", 1)[0] in INTERACTIVE_COMMANDS
+
+
+def chat_key(update: TelegramObject) -> Optional[Hashable]:
+    if not isinstance(update, Update):
+        return None
+    context = UserContextMiddleware.resolve_event_context(update)
+    key = context.chat.id if context.chat else (context.user.id if context.user else None)
+    if key is None:
+        return None
+    # Lanes are ordered independently so a button press never waits for a reading
+    return key, classify_update(update)
+
+
+async def notify_chat_queue_full(bot: Bot, key: Hashable) -> None:
+    chat_id, _ = key
+    logger.warning("Chat %s queue is full, dropping update", key)
+    try:
+        await bot.send_message(chat_id, BotMessages.CHAT_QUEUE_FULL)
+    except Exception as e:
+        logger.warning(f"Error sending queue full notice to chat {chat_id}: {e}")
+
+
+@dataclass
+class AdmissionStats:
+    admitted: int = 0
+    in_flight: int = 0
+    waiting: int = 0
+    queued_notices: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    
+    @property
+    def avg_wait(self) -> float:
+        return self.total_wait / self.admitted if self.admitted else 0.0
+
+
+class AdmissionController:
+    
+    def __init__(self, max_concurrency: int, queue_notice_after: float = 3.0):
+        self.max_concurrency = max_concurrency
+        self.queue_notice_after = queue_notice_after
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._stats = AdmissionStats()
+    
+    @asynccontextmanager
+    async def slot(self, on_queued: Optional[QueuedCallback] = None):
+        started = time.perf_counter()
+        self._stats.waiting += 1
+        try:
+            acquire = asyncio.ensure_future(self._semaphore.acquire())
+            try:
+                done, _ = await asyncio.wait({acquire}, timeout=self.queue_notice_after)
+                if not done:
+                    self._stats.queued_notices += 1
+                    if on_queued:
+                        try:
+                            await on_queued()
+                        except Exception as e:
+                            logger.warning(f"Error sending queued notice: {e}")
+                    await acquire
+            except BaseException:
+                if acquire.done() and not acquire.cancelled():
+                    self._semaphore.release()
+                else:
+                    acquire.cancel()
+                raise
+        finally:
+            self._stats.waiting -= 1
+        
+        wait = time.perf_counter() - started
+        self._stats.admitted += 1
+        self._stats.total_wait += wait
+        self._stats.max_wait = max(self._stats.max_wait, wait)
+        self._stats.in_flight += 1
+        try:
+            yield wait
+        finally:
+            self._stats.in_flight -= 1
+            self._semaphore.release()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "admitted": self._stats.admitted,
+            "in_flight": self._stats.in_flight,
+            "waiting": self._stats.waiting,
+            "queued_notices": self._stats.queued_notices,
+            "avg_wait": self._stats.avg_wait,
+            "max_wait": self._stats.max_wait
+        }
+
+
+@dataclass
+class LaneStats:
+    processed: int = 0
+    in_flight: int = 0
+    waiting: int = 0
+    max_wait: float = 0.0
+
+
+class PriorityLanes:
+    
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = dict(limits)
+        self._semaphores = {lane: asyncio.Semaphore(limit) for lane, limit in self.limits.items()}
+        self._stats = {lane: LaneStats() for lane in self.limits}
+    
+    @asynccontextmanager
+    async def slot(self, lane: str):
+        semaphore = self._semaphores.get(lane) or self._semaphores[LANE_INTERACTIVE]
+        stats = self._stats.get(lane) or self._stats[LANE_INTERACTIVE]
+        
+        started = time.perf_counter()
+        stats.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            stats.waiting -= 1
+        
+        stats.max_wait = max(stats.max_wait, time.perf_counter() - started)
+        stats.in_flight += 1
+        try:
+            yield
+        finally:
+            stats.in_flight -= 1
+            stats.processed += 1
+            semaphore.release()
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            lane: {
+                "limit": self.limits[lane],
+                "processed": stats.processed,
+                "in_flight": stats.in_flight,
+                "waiting": stats.waiting,
+                "max_wait": stats.max_wait
+            }
+            for lane, stats in self._stats.items()
+        }
+
+
+class PriorityLaneMiddleware(BaseMiddleware):
+    
+    def __init__(self, lanes: PriorityLanes):
+        self.lanes = lanes
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        async with self.lanes.slot(classify_update(event)):
+            return await handler(event, data)
+
+
+class _ChatQueue:
+    
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+        self.notified = False
+
+
+class ChatOrderingMiddleware(BaseMiddleware):
+    
+    def __init__(self, max_depth: int = 5):
+        self.max_depth = max_depth
+        self._queues: Dict[Hashable, _ChatQueue] = {}
+        self.dropped = 0
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        key = chat_key(event)
+        if key is None:
+            return await handler(event, data)
+        
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _ChatQueue()
+        
+        if queue.depth >= self.max_depth:
+            self.dropped += 1
+            # One notice per backlog, so a user who keeps typing is not answered for every message
+            if not queue.notified:
+                queue.notified = True
+                await notify_chat_queue_full(data["bot"], key)
+            return None
+        
+        # asyncio.Lock wakes waiters in FIFO order, so updates run in arrival order.
+        # Waiting here is cheap in polling mode, where every update already has its own task.
+        queue.depth += 1
+        try:
+            async with queue.lock:
+                return await handler(event, data)
+        finally:
+            queue.depth -= 1
+            if queue.depth == 0:
+                self._queues.pop(key, None)
+    
+    @property
+    def active_chats(self) -> int:
+        return len(self._queues)
@@ -6,6 +6,11 @@ class BotSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="BOT_", env_file=".env", env_file_encoding="utf-8", extra='ignore')
     
     TOKEN: str
+    STREAM_EDIT_INTERVAL: float = 1.5
+    CHAT_QUEUE_DEPTH: int = 5
+    INTERACTIVE_WORKERS: int = 16
+    READING_WORKERS: int = 16
+    VOICE_WORKERS: int = 4
 
 
 class DatabaseSettings(BaseSettings):
@@ -37,9 +42,43 @@ class OpenAISettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="OPENAI_", env_file=".env", env_file_encoding="utf-8", extra='ignore')
     
     API_KEY: str = ""
+    BASE_URL: str = ""
     MODEL: str = "gpt-4o-mini"
     MAX_TOKENS: int = 500
+    MIN_TOKENS: int = 250
+    ADAPTIVE_QUESTION_CHARS: int = 300
     TEMPERATURE: float = 0.7
+    COMBINED_GENERATION: bool = True
+    STREAMING: bool = True
+    MAX_CONCURRENCY: int = 16
+    QUEUE_NOTICE_SECONDS: float = 3.0
+    READING_BUDGET_SECONDS: float = 25.0
+    REQUEST_TIMEOUT: float = 20.0
+    CONNECT_TIMEOUT: float = 5.0
+    MAX_RETRIES: int = 3
+    MAX_CONNECTIONS: int = 100
+    MAX_KEEPALIVE_CONNECTIONS: int = 20
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_SLOW_CALL_SECONDS: float = 15.0
+    BREAKER_WINDOW_SIZE: int = 20
+    BREAKER_MIN_CALLS: int = 5
+    BREAKER_OPEN_SECONDS: float = 30.0
+
+
+class WebhookSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="WEBHOOK_", env_file=".env", env_file_encoding="utf-8", extra='ignore')
+    
+    ENABLED: bool = False
+    BASE_URL: str = ""
+    PATH: str = "/webhook"
+    SECRET_TOKEN: str = ""
+    HOST: str = "0.0.0.0"
+    PORT: int = 8080
+    QUEUE_SIZE: int = 1000
+    
+    @property
+    def URL(self) -> str:
+        return f"{self.BASE_URL.rstrip('/')}{self.PATH}"
 
 
 class AppSettings(BaseSettings):
@@ -57,6 +96,34 @@ class LogSettings(BaseSettings):
     LEVEL: str = "INFO"
 
 
+class TarotConfig:
+    
+    def __init__(self):
+        self.rider_waite_cards = [
+            "Шут", "Маг", "Верховная Жрица", "Императрица", "Император",
+            "Иерофант", "Влюблённые", "Колесница", "Сила", "Отшельник",
+            "Колесо Фортуны", "Справедливость", "Повешенный", "Смерть",
+            "Умеренность", "Дьявол", "Башня", "Звезда", "Луна", "Солнце",
+            "Суд", "Мир",
+        ] + [
+            f"{rank} {suit}"
+            for suit in ("Жезлов", "Кубков", "Мечей", "Пентаклей")
+            for rank in (
+                "Туз", "Двойка", "Тройка", "Четвёрка", "Пятёрка", "Шестёрка",
+                "Семёрка", "Восьмёрка", "Девятка", "Десятка",
+                "Паж", "Рыцарь", "Королева", "Король",
+            )
+        ]
+        self.lenormand_cards = [
+            "Всадник", "Клевер", "Корабль", "Дом", "Дерево", "Тучи", "Змея",
+            "Гроб", "Букет", "Коса", "Метла", "Птицы", "Ребёнок", "Лиса",
+            "Медведь", "Звёзды", "Аист", "Собака", "Башня", "Сад", "Гора",
+            "Дороги", "Мыши", "Сердце", "Кольцо", "Книга", "Письмо", "Мужчина",
+            "Женщина", "Лилии", "Солнце", "Луна", "Ключ", "Рыбы", "Якорь",
+            "Крест",
+        ]
+
+
 class Settings:
     def __init__(self):
         self.bot = BotSettings()
@@ -65,6 +132,8 @@ class Settings:
         self.app = AppSettings()
         self.log = LogSettings()
         self.openai = OpenAISettings()
+        self.webhook = WebhookSettings()
+        self.tarot = TarotConfig()
 
 
 settings = Settings()
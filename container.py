@@ -1,4 +1,6 @@
 from typing import Dict, Any, Type, TypeVar
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
 from interfaces import (
     IUserRepository, ITarotService, IUserService, IMessageService, IValidator
 )
@@ -10,6 +12,7 @@ from core.database import DatabaseManagerFactory
 from cache import CacheManagerFactory
 from rate_limiter import RateLimiterFactory
 from gpt_service import GPTService
+from gpt_client import GPTClientFactory
 
 T = TypeVar('T')
 
@@ -23,6 +26,7 @@ class DIContainer:
         self._db_manager = None
         self._cache_manager = None
         self._rate_limiter = None
+        self._gpt_client = None
     
     def register_singleton(self, interface: Type[T], implementation: Type[T]) -> None:
         self._singletons[interface] = implementation
@@ -59,6 +63,7 @@ class DIContainer:
             self._db_manager = DatabaseManagerFactory.create_database_manager(database_url)
             self._cache_manager = CacheManagerFactory.create_cache_manager(redis_url)
             self._rate_limiter = RateLimiterFactory.create_rate_limiter(redis_url)
+            self._gpt_client = GPTClientFactory.create_gpt_client()
             
             await self._db_manager.initialize()
             await self._cache_manager.initialize()
@@ -67,23 +72,25 @@ class DIContainer:
             self.register_singleton(IValidator, SecurityValidator)
             self.register_factory(
                 IUserRepository, 
-                lambda: PostgreSQLUserRepository(db_manager=self._db_manager)
+                lambda: PostgreSQLUserRepository(
+                    db_manager=self._db_manager,
+                    cache_manager=self._cache_manager
+                )
             )
             
-            self.register_factory(
+            self.register_singleton(
                 ITarotService, 
-                lambda: TarotService(
-                    tarot_config, 
+                TarotService(
+                    settings.tarot, 
                     cache_manager=self._cache_manager,
-                    gpt_service=GPTService()
+                    gpt_service=GPTService(client=self._gpt_client)
                 )
             )
-            self.register_factory(
+            self.register_singleton(
                 IUserService,
-                lambda: UserService(
+                UserService(
                     self.get(IUserRepository),
-                    referral_bonus=10,
-                    cache_manager=self._cache_manager
+                    referral_bonus=settings.app.REFERRAL_BONUS
                 )
             )
             self.register_factory(IMessageService, MessageService)
@@ -101,8 +108,28 @@ class DIContainer:
                 await self._cache_manager.close()
             if self._rate_limiter:
                 await self._rate_limiter.close()
+            if self._gpt_client:
+                await self._gpt_client.close()
         except Exception as e:
             pass
+        finally:
+            self._singletons.clear()
+            self._factories.clear()
+            self._initialized = False
+
+
+class ContainerMiddleware(BaseMiddleware):
+    
+    async def __call__(
+        self,
+        handler,
+        event: TelegramObject,
+        data: Dict
+    ) -> Any:
+        container: DIContainer = data["container"]
+        data["user_service"] = container.get(IUserService)
+        data["tarot_service"] = container.get(ITarotService)
+        return await handler(event, data)
 
 
 class ContainerFactory:
@@ -0,0 +1,161 @@
+import asyncio
+import hmac
+import logging
+from collections import deque
+from typing import Deque, Dict, Hashable, List, Optional, Set, Tuple
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from concurrency import LANE_INTERACTIVE, chat_key, classify_update, notify_chat_queue_full
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        path: str = "/webhook",
+        secret_token: str = "",
+        queue_size: int = 1000,
+        lanes: Optional[Dict[str, int]] = None,
+        chat_queue_depth: int = 5
+    ):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.max_queue_size = queue_size
+        self.chat_queue_depth = chat_queue_depth
+        self.lanes = lanes or {LANE_INTERACTIVE: 8}
+        # Lane queues hold (chat key, None) for a chat with pending updates, or (None, update) for chatless ones
+        self._queues: Dict[str, asyncio.Queue] = {lane: asyncio.Queue() for lane in self.lanes}
+        # Pending updates per chat and lane; a key is present while the chat is scheduled or running
+        self._chats: Dict[Hashable, Deque[Update]] = {}
+        self._pending: Dict[str, int] = {lane: 0 for lane in self.lanes}
+        self._notified: Set[Hashable] = set()
+        self._notice_tasks: Set[asyncio.Task] = set()
+        self._worker_tasks: List[asyncio.Task] = []
+        self._runner: Optional[web.AppRunner] = None
+        self.dropped = 0
+    
+    @property
+    def queue_size(self) -> int:
+        return sum(self._pending.values())
+    
+    @property
+    def queue_sizes(self) -> Dict[str, int]:
+        return dict(self._pending)
+    
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        return app
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret_token:
+            token = request.headers.get(SECRET_TOKEN_HEADER, "")
+            if not hmac.compare_digest(token, self.secret_token):
+                return web.Response(status=401)
+        
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Rejected malformed webhook update: {e}")
+            return web.Response(status=400)
+        
+        lane = classify_update(update)
+        if lane not in self._queues:
+            lane = next(iter(self._queues))
+        if self._pending[lane] >= self.max_queue_size:
+            # Non-2xx makes Telegram redeliver the update later
+            return web.Response(status=503)
+        
+        key = chat_key(update)
+        if key is None:
+            self._enqueue(lane, (None, update))
+            return web.Response()
+        
+        pending = self._chats.get(key)
+        if pending is None:
+            self._chats[key] = deque([update])
+            self._enqueue(lane, (key, None))
+        elif len(pending) >= self.chat_queue_depth:
+            self.dropped += 1
+            # One notice per backlog, so a user who keeps typing is not answered for every message
+            if key not in self._notified:
+                self._notified.add(key)
+                task = asyncio.create_task(notify_chat_queue_full(self.bot, key))
+                self._notice_tasks.add(task)
+                task.add_done_callback(self._notice_tasks.discard)
+        else:
+            pending.append(update)
+            self._pending[lane] += 1
+        
+        return web.Response()
+    
+    def _enqueue(self, lane: str, item: Tuple[Optional[Hashable], Optional[Update]]) -> None:
+        self._pending[lane] += 1
+        self._queues[lane].put_nowait(item)
+    
+    async def _worker(self, lane: str) -> None:
+        # A chat is queued at most once, so its backlog waits here without holding a worker
+        queue = self._queues[lane]
+        while True:
+            key, update = await queue.get()
+            try:
+                if key is not None:
+                    # Left in the chat's deque until done, so the depth limit counts the running update too
+                    update = self._chats[key][0]
+                self._pending[lane] -= 1
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception as e:
+                logger.exception(f"Error processing update id={update.update_id}: {e}")
+            finally:
+                if key is not None:
+                    self._chats[key].popleft()
+                    if self._chats[key]:
+                        # Back of the line, so one busy chat cannot monopolise the lane
+                        queue.put_nowait((key, None))
+                    else:
+                        del self._chats[key]
+                        self._notified.discard(key)
+                queue.task_done()
+    
+    async def start(self, host: str, port: int) -> None:
+        # Each lane has its own worker pool, so slow readings cannot starve button presses
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(lane))
+            for lane, workers in self.lanes.items()
+            for _ in range(workers)
+        ]
+        
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        logger.info(f"Webhook server listening on {host}:{port}{self.path}")
+    
+    async def stop(self, drain_timeout: float = 30) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues.values())),
+                timeout=drain_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self.queue_size} queued updates on shutdown")
+        
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, *self._notice_tasks, return_exceptions=True)
+        self._worker_tasks = []
@@ -53,6 +53,7 @@ class TarotReading:
     interpretation: str
     advice: str
     remaining_messages: int
+    is_fallback: bool = False
 
 
 class ModelAdmin:
@@ -0,0 +1,168 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import openai
+from openai import AsyncOpenAI
+
+try:
+    import httpx
+except ImportError:
+    # Newer openai releases ship their transport as httpx2
+    import httpx2 as httpx
+
+from config import settings
+
+
+@dataclass
+class GPTClientStats:
+    requests: int = 0
+    retries: int = 0
+    timeouts: int = 0
+    rate_limited: int = 0
+    server_errors: int = 0
+    connection_errors: int = 0
+    failures: int = 0
+
+
+class GPTClient:
+    
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "",
+        reading_budget: float = 25.0,
+        request_timeout: float = 20.0,
+        connect_timeout: float = 5.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0
+    ):
+        self.reading_budget = reading_budget
+        self.request_timeout = request_timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._stats = GPTClientStats()
+        
+        self._http_client = openai.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            timeout=httpx.Timeout(request_timeout, connect=connect_timeout)
+        )
+        # Retries are handled here so they share the reading deadline
+        self._client = AsyncOpenAI(
+            api_key=api_key,
+            # Empty means the official endpoint; set it to point at a proxy or a local stand-in
+            base_url=base_url or None,
+            http_client=self._http_client,
+            max_retries=0
+        )
+    
+    async def create_chat_completion(self, budget: Optional[float] = None, **kwargs) -> Any:
+        deadline = time.monotonic() + (budget or self.reading_budget)
+        delay = self.backoff_base
+        attempt = 0
+        
+        while True:
+            remaining = deadline - time.monotonic()
+            self._stats.requests += 1
+            retry_after = None
+            try:
+                return await self._client.chat.completions.create(
+                    timeout=httpx.Timeout(
+                        min(self.request_timeout, remaining),
+                        connect=min(self.connect_timeout, remaining)
+                    ),
+                    **kwargs
+                )
+            except openai.APITimeoutError as e:
+                self._stats.timeouts += 1
+                error = e
+            except openai.RateLimitError as e:
+                self._stats.rate_limited += 1
+                retry_after = self._retry_after(e.response)
+                error = e
+            except openai.InternalServerError as e:
+                self._stats.server_errors += 1
+                retry_after = self._retry_after(e.response)
+                error = e
+            except openai.APIConnectionError as e:
+                self._stats.connection_errors += 1
+                error = e
+            
+            attempt += 1
+            # Decorrelated jitter: each sleep is drawn from [base, 3 * previous sleep]
+            delay = min(self.backoff_cap, random.uniform(self.backoff_base, delay * 3))
+            wait = max(delay, retry_after or 0)
+            
+            if attempt > self.max_retries or time.monotonic() + wait >= deadline:
+                self._stats.failures += 1
+                raise error
+            
+            self._stats.retries += 1
+            await asyncio.sleep(wait)
+    
+    def _retry_after(self, response: Any) -> Optional[float]:
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return None
+        
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return float(retry_after_ms) / 1000
+            except ValueError:
+                pass
+        
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "requests": self._stats.requests,
+            "retries": self._stats.retries,
+            "timeouts": self._stats.timeouts,
+            "rate_limited": self._stats.rate_limited,
+            "server_errors": self._stats.server_errors,
+            "connection_errors": self._stats.connection_errors,
+            "failures": self._stats.failures
+        }
+    
+    async def close(self) -> None:
+        await self._client.close()
+
+
+class GPTClientFactory:
+    
+    @staticmethod
+    def create_gpt_client() -> GPTClient:
+        return GPTClient(
+            api_key=settings.openai.API_KEY,
+            base_url=settings.openai.BASE_URL,
+            reading_budget=settings.openai.READING_BUDGET_SECONDS,
+            request_timeout=settings.openai.REQUEST_TIMEOUT,
+            connect_timeout=settings.openai.CONNECT_TIMEOUT,
+            max_retries=settings.openai.MAX_RETRIES,
+            max_connections=settings.openai.MAX_CONNECTIONS,
+            max_keepalive_connections=settings.openai.MAX_KEEPALIVE_CONNECTIONS
+        )
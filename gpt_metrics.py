@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class UsageStats:
+    calls: int = 0
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+    ttft_calls: int = 0
+    total_ttft: float = 0.0
+    
+    def add(
+        self,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_prompt_tokens: int,
+        latency: float,
+        ttft: Optional[float]
+    ) -> None:
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_prompt_tokens += cached_prompt_tokens
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        if ttft is not None:
+            self.ttft_calls += 1
+            self.total_ttft += ttft
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_prompt_tokens": self.cached_prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_latency": self.total_latency / self.calls if self.calls else 0.0,
+            "max_latency": self.max_latency,
+            "avg_ttft": self.total_ttft / self.ttft_calls if self.ttft_calls else None
+        }
+
+
+class GPTMetrics:
+    
+    def __init__(self):
+        self._by_model: Dict[str, UsageStats] = {}
+        self._by_card: Dict[str, UsageStats] = {}
+    
+    def record(
+        self,
+        model: str,
+        card: str,
+        usage: Any,
+        latency: float,
+        ttft: Optional[float] = None
+    ) -> None:
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_prompt_tokens = getattr(details, "cached_tokens", 0) or 0
+        
+        for stats in (
+            self._by_model.setdefault(model, UsageStats()),
+            self._by_card.setdefault(card, UsageStats())
+        ):
+            stats.add(prompt_tokens, completion_tokens, cached_prompt_tokens, latency, ttft)
+    
+    def get_stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        return {
+            "models": {model: stats.to_dict() for model, stats in self._by_model.items()},
+            "cards": {card: stats.to_dict() for card, stats in self._by_card.items()}
+        }
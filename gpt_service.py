@@ -1,94 +1,299 @@
 import asyncio
-from typing import Optional
-from openai import AsyncOpenAI
+import json
+import time
+from typing import Any, AsyncIterator, Optional, Tuple
 from config import settings
+from concurrency import AdmissionController, QueuedCallback
+from gpt_client import GPTClient, GPTClientFactory
+from gpt_metrics import GPTMetrics
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED
 
 
 class GPTService:
     
-    def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.openai.API_KEY)
+    ADVICE_MARKER = "[СОВЕТ]"
+    
+    # System prompts hold every static instruction and never change between calls,
+    # so the provider can cache the prompt prefix; per-reading data goes last
+    INTERPRETATION_SYSTEM_PROMPT = (
+        "Ты опытный таролог с глубокими знаниями карт Таро. Твоя задача - дать точное и полезное "
+        "толкование карты в контексте вопроса клиента. Отвечай на русском языке, будь мудрым и поддерживающим.\n\n"
+        "Дай подробное толкование выпавшей карты в контексте вопроса клиента. "
+        "Объясни, что означает эта карта для данной ситуации, какие энергии она несет, "
+        "и как она может помочь в решении вопроса."
+    )
+    
+    ADVICE_SYSTEM_PROMPT = (
+        "Ты мудрый советчик, который помогает людям принимать правильные решения. На основе карты Таро "
+        "и вопроса клиента дай практический и мудрый совет. Отвечай на русском языке, будь конкретным и поддерживающим.\n\n"
+        "Что нужно делать, как действовать, на что обратить внимание. Будь конкретным и полезным."
+    )
+    
+    READING_INSTRUCTIONS = (
+        "Ты опытный таролог и мудрый советчик. Дай толкование карты Таро в контексте вопроса клиента "
+        "и практический совет. Отвечай на русском языке, будь мудрым, конкретным и поддерживающим.\n\n"
+        "1. interpretation — подробное толкование выпавшей карты в контексте вопроса клиента: "
+        "что означает эта карта для данной ситуации, какие энергии она несет "
+        "и как она может помочь в решении вопроса.\n"
+        "2. advice — практический совет: что нужно делать, как действовать, "
+        "на что обратить внимание. Будь конкретным и полезным."
+    )
+    
+    READING_SYSTEM_PROMPT = (
+        READING_INSTRUCTIONS
+        + "\n\nОтвет верни строго в виде JSON-объекта с полями \"interpretation\" и \"advice\"."
+    )
+    
+    STREAM_SYSTEM_PROMPT = (
+        READING_INSTRUCTIONS
+        + f"\n\nСначала напиши толкование, затем отдельной строкой {ADVICE_MARKER} и после неё совет. "
+        "Не используй разметку."
+    )
+    
+    def __init__(
+        self,
+        client: Optional[GPTClient] = None,
+        admission: Optional[AdmissionController] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        metrics: Optional[GPTMetrics] = None
+    ):
+        self.client = client or GPTClientFactory.create_gpt_client()
+        self.admission = admission or AdmissionController(
+            settings.openai.MAX_CONCURRENCY,
+            queue_notice_after=settings.openai.QUEUE_NOTICE_SECONDS
+        )
+        self.breaker = breaker or CircuitBreaker(
+            failure_rate_threshold=settings.openai.BREAKER_FAILURE_RATE,
+            slow_call_seconds=settings.openai.BREAKER_SLOW_CALL_SECONDS,
+            window_size=settings.openai.BREAKER_WINDOW_SIZE,
+            min_calls=settings.openai.BREAKER_MIN_CALLS,
+            open_seconds=settings.openai.BREAKER_OPEN_SECONDS
+        )
+        self.metrics = metrics or GPTMetrics()
         self.model = settings.openai.MODEL
         self.max_tokens = settings.openai.MAX_TOKENS
+        self.min_tokens = min(settings.openai.MIN_TOKENS, self.max_tokens)
         self.temperature = settings.openai.TEMPERATURE
     
-    async def generate_interpretation(self, card: str, question: str) -> str:
-        if not settings.openai.API_KEY:
+    async def generate_interpretation(self, card: str, question: str, on_queued: Optional[QueuedCallback] = None) -> str:
+        if not settings.openai.API_KEY or self.breaker.is_open:
             return self._get_fallback_interpretation(card)
         
         try:
-            prompt = self._build_interpretation_prompt(card, question)
-            
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Ты опытный таролог с глубокими знаниями карт Таро. Твоя задача - дать точное и полезное толкование карты в контексте вопроса клиента. Отвечай на русском языке, будь мудрым и поддерживающим."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=self.max_tokens,
-                temperature=self.temperature
+            content = await self._complete(
+                card,
+                self.INTERPRETATION_SYSTEM_PROMPT,
+                self._build_prompt(card, question),
+                max_tokens=self._output_budget(question),
+                on_queued=on_queued,
+                # The two-call path splits the reading budget between both calls
+                budget=self.client.reading_budget / 2
             )
             
-            return response.choices[0].message.content.strip()
-            
+            return content.strip()
+        
+        except CircuitOpenError:
+            return self._get_fallback_interpretation(card)
         except Exception as e:
             print(f"Error generating interpretation: {e}")
             return self._get_fallback_interpretation(card)
     
-    async def generate_advice(self, card: str, question: str) -> str:
-        if not settings.openai.API_KEY:
+    async def generate_advice(self, card: str, question: str, on_queued: Optional[QueuedCallback] = None) -> str:
+        if not settings.openai.API_KEY or self.breaker.is_open:
+            return self._get_fallback_advice()
+        
+        try:
+            content = await self._complete(
+                card,
+                self.ADVICE_SYSTEM_PROMPT,
+                self._build_prompt(card, question),
+                max_tokens=self._output_budget(question),
+                on_queued=on_queued,
+                budget=self.client.reading_budget / 2
+            )
+            
+            return content.strip()
+        
+        except CircuitOpenError:
+            return self._get_fallback_advice()
+        except Exception as e:
+            print(f"Error generating advice: {e}")
             return self._get_fallback_advice()
+    
+    async def generate_reading(self, card: str, question: str, on_queued: Optional[QueuedCallback] = None) -> Tuple[str, str]:
+        if not settings.openai.API_KEY or self.breaker.is_open:
+            return self._get_fallback_interpretation(card), self._get_fallback_advice()
         
         try:
-            prompt = self._build_advice_prompt(card, question)
+            content = await self._complete(
+                card,
+                self.READING_SYSTEM_PROMPT,
+                self._build_prompt(card, question),
+                max_tokens=self._output_budget(question, sections=2),
+                on_queued=on_queued,
+                response_format={"type": "json_object"}
+            )
             
-            response = await self.client.chat.completions.create(
+            return self._parse_reading(content, card)
+        
+        except CircuitOpenError:
+            return self._get_fallback_interpretation(card), self._get_fallback_advice()
+        except Exception as e:
+            print(f"Error generating reading: {e}")
+            return self._get_fallback_interpretation(card), self._get_fallback_advice()
+    
+    async def _complete(
+        self,
+        card: str,
+        system_prompt: str,
+        prompt: str,
+        max_tokens: int,
+        on_queued: Optional[QueuedCallback] = None,
+        **kwargs: Any
+    ) -> Optional[str]:
+        async with self.admission.slot(on_queued), self.breaker.guard():
+            started = time.perf_counter()
+            response = await self.client.create_chat_completion(
                 model=self.model,
                 messages=[
                     {
                         "role": "system",
-                        "content": "Ты мудрый советчик, который помогает людям принимать правильные решения. На основе карты Таро и вопроса клиента дай практический и мудрый совет. Отвечай на русском языке, будь конкретным и поддерживающим."
+                        "content": system_prompt
                     },
                     {
                         "role": "user",
                         "content": prompt
                     }
                 ],
-                max_tokens=self.max_tokens,
-                temperature=self.temperature
+                max_tokens=max_tokens,
+                temperature=self.temperature,
+                **kwargs
             )
+        
+        self.metrics.record(self.model, card, response.usage, time.perf_counter() - started)
+        return response.choices[0].message.content
+    
+    def _output_budget(self, question: str, sections: int = 1) -> int:
+        # Short questions get short answers; the full budget is reserved for detailed ones
+        ratio = min(1.0, len(question) / settings.openai.ADAPTIVE_QUESTION_CHARS)
+        return int(self.min_tokens + (self.max_tokens - self.min_tokens) * ratio) * sections
+    
+    def _parse_reading(self, content: Optional[str], card: str) -> Tuple[str, str]:
+        data = {}
+        if content:
+            start = content.find("{")
+            end = content.rfind("}")
+            if start != -1 and end > start:
+                try:
+                    data = json.loads(content[start:end + 1])
+                except ValueError:
+                    data = {}
+        
+        if not isinstance(data, dict):
+            data = {}
+        
+        interpretation = data.get("interpretation")
+        if not isinstance(interpretation, str) or not interpretation.strip():
+            interpretation = self._get_fallback_interpretation(card)
+        
+        advice = data.get("advice")
+        if not isinstance(advice, str) or not advice.strip():
+            advice = self._get_fallback_advice()
+        
+        return interpretation.strip(), advice.strip()
+    
+    async def stream_reading(self, card: str, question: str, on_queued: Optional[QueuedCallback] = None) -> AsyncIterator[str]:
+        if not settings.openai.API_KEY or self.breaker.is_open:
+            yield f"{self._get_fallback_interpretation(card)}\n{self.ADVICE_MARKER}\n{self._get_fallback_advice()}"
+            return
+        
+        try:
+            prompt = self._build_prompt(card, question)
             
-            return response.choices[0].message.content.strip()
-            
+            async with self.admission.slot(on_queued):
+                started = time.perf_counter()
+                # Held across the whole stream: the call returns at the headers, and failing
+                # streams must still count against the breaker
+                async with self.breaker.guard() as call:
+                    stream = await self.client.create_chat_completion(
+                        model=self.model,
+                        messages=[
+                            {
+                                "role": "system",
+                                "content": self.STREAM_SYSTEM_PROMPT
+                            },
+                            {
+                                "role": "user",
+                                "content": prompt
+                            }
+                        ],
+                        max_tokens=self._output_budget(question, sections=2),
+                        temperature=self.temperature,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
+                
+                    ttft = None
+                    usage = None
+                    # Only upstream waits count as slow: time to first token and the longest gap
+                    # between chunks, never the time the consumer spends between them
+                    longest_gap = 0.0
+                    waiting_since = started
+                    async for chunk in stream:
+                        longest_gap = max(longest_gap, time.perf_counter() - waiting_since)
+                        # With include_usage the last chunk carries usage and no choices
+                        if getattr(chunk, "usage", None):
+                            usage = chunk.usage
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            if ttft is None:
+                                ttft = time.perf_counter() - started
+                            yield chunk.choices[0].delta.content
+                        waiting_since = time.perf_counter()
+                    
+                    call.slow = (
+                        (ttft or 0.0) >= self.breaker.slow_call_seconds
+                        or longest_gap >= self.breaker.slow_call_seconds
+                    )
+                
+                self.metrics.record(self.model, card, usage, time.perf_counter() - started, ttft)
+        
+        except CircuitOpenError:
+            return
         except Exception as e:
-            print(f"Error generating advice: {e}")
-            return self._get_fallback_advice()
+            print(f"Error streaming reading: {e}")
     
-    def _build_interpretation_prompt(self, card: str, question: str) -> str:
-        return f"""
-Карта: {card}
-Вопрос клиента: {question}
-
-Дай подробное толкование карты {card} в контексте вопроса клиента. 
-Объясни, что означает эта карта для данной ситуации, какие энергии она несет, 
-и как она может помочь в решении вопроса.
-"""
-    
-    def _build_advice_prompt(self, card: str, question: str) -> str:
-        return f"""
-Карта: {card}
-Вопрос клиента: {question}
-
-На основе карты {card} и вопроса клиента дай практический совет. 
-Что нужно делать, как действовать, на что обратить внимание. 
-Будь конкретным и полезным.
-"""
+    def split_streamed_reading(self, text: str, card: str, complete: bool = False) -> Tuple[str, str]:
+        if self.ADVICE_MARKER in text:
+            interpretation, advice = text.split(self.ADVICE_MARKER, 1)
+        else:
+            interpretation, advice = text, ""
+            # Hide a marker that has only partially arrived
+            for size in range(len(self.ADVICE_MARKER) - 1, 0, -1):
+                if interpretation.endswith(self.ADVICE_MARKER[:size]):
+                    interpretation = interpretation[:-size]
+                    break
+        
+        interpretation = interpretation.strip()
+        advice = advice.strip()
+        
+        if complete:
+            interpretation = interpretation or self._get_fallback_interpretation(card)
+            advice = advice or self._get_fallback_advice()
+        
+        return interpretation, advice
+    
+    def _build_prompt(self, card: str, question: str) -> str:
+        return f"Карта: {card}\nВопрос клиента: {question}"
+    
+    @property
+    def is_degraded(self) -> bool:
+        return self.breaker.state != CLOSED
+    
+    def is_fallback(self, card: str, interpretation: str, advice: str) -> bool:
+        return (
+            interpretation == self._get_fallback_interpretation(card)
+            or advice == self._get_fallback_advice()
+        )
     
     def _get_fallback_interpretation(self, card: str) -> str:
         return f"Карта {card} указывает на важные изменения в вашей жизни. Звезды советуют быть внимательными к знакам судьбы и доверять своей интуиции."
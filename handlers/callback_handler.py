@@ -3,7 +3,6 @@ from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardBut
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from messages import BotMessages
-from container import ContainerFactory
 from interfaces import IUserService
 
 router = Router()
@@ -46,17 +45,9 @@ def back_to_menu_keyboard() -> InlineKeyboardMarkup:
 
 
 @router.callback_query(F.data == "back_to_menu")
-async def back_to_menu_callback(callback: CallbackQuery):
+async def back_to_menu_callback(callback: CallbackQuery, user_service: IUserService):
     try:
-        container = await ContainerFactory.create_container()
-        user_service = container.get(IUserService)
-        
-        user = await user_service.get_or_create_user(
-            user_id=callback.from_user.id,
-            username=callback.from_user.username,
-            first_name=callback.from_user.first_name,
-            last_name=callback.from_user.last_name
-        )
+        user = await user_service.get_or_create_user(user_id=callback.from_user.id)
         
         await callback.message.edit_text(
             text=f"🏠 Главное меню:\n\nВаш баланс: {user.balance} сообщений",
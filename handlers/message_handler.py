@@ -1,15 +1,20 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.enums import ChatAction
+from aiogram.utils.chat_action import ChatActionSender
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import asyncio
+import html
 
 from messages import BotMessages
-from container import ContainerFactory
+from config import settings
+from db.models import TarotReading, DeckType
 from interfaces import IUserService, ITarotService
+from utils.telegram import CoalescingMessageEditor, TELEGRAM_TEXT_LIMIT, escape_truncated
 
 router = Router()
 
+CHAT_ACTION_INTERVAL = 4
+
 
 def buy_messages_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
@@ -29,103 +34,162 @@ def buy_messages_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def render_reading(reading: TarotReading, remaining_messages: int) -> str:
+    template = BotMessages.TAROT_READING_MESSAGE
+    # Leave room for the notice that may be appended to the final text
+    budget = (
+        TELEGRAM_TEXT_LIMIT
+        - len(BotMessages.DEGRADED_MODE_NOTICE)
+        - len(template.format(question="", card="", interpretation="", advice="", remaining_messages=remaining_messages))
+    )
+    
+    card = escape_truncated(reading.card, budget // 8)
+    question = escape_truncated(reading.question, (budget - len(card)) // 4)
+    budget -= len(card) + len(question)
+    
+    # Whichever section is shorter keeps all of it; the other gets the rest of the budget
+    advice = html.escape(reading.advice)
+    interpretation = html.escape(reading.interpretation)
+    if len(advice) + len(interpretation) > budget:
+        advice = escape_truncated(reading.advice, max(budget // 2, budget - len(interpretation)))
+        interpretation = escape_truncated(reading.interpretation, budget - len(advice))
+    
+    return template.format(
+        question=question,
+        card=card,
+        interpretation=interpretation,
+        advice=advice,
+        remaining_messages=remaining_messages
+    )
+
+
 @router.message(F.text)
-async def handle_text_message(msg: Message):
+async def handle_text_message(
+    msg: Message,
+    user_service: IUserService,
+    tarot_service: ITarotService
+):
+    generation = None
+    stream = None
+    reserved = False
+    
+    async def notify_queued():
+        await msg.answer(BotMessages.READING_QUEUED)
+    
     try:
-        container = await ContainerFactory.create_container()
-        user_service = container.get(IUserService)
-        tarot_service = container.get(ITarotService)
-        
-        user = await user_service.get_or_create_user(
-            user_id=msg.from_user.id,
-            username=msg.from_user.username,
-            first_name=msg.from_user.first_name,
-            last_name=msg.from_user.last_name
-        )
-        
-        if not await user_service.can_send_message(user.user_id):
-            await msg.answer(
-                text=BotMessages.NO_MESSAGES_MESSAGE,
-                reply_markup=buy_messages_keyboard()
-            )
-            return
-        
-        await msg.bot.send_chat_action(chat_id=msg.chat.id, action=ChatAction.TYPING)
-        await asyncio.sleep(2)
-        
-        partial_message = await msg.answer("✍️ пе")
-        
-        await asyncio.sleep(3)
-        
-        reading = await tarot_service.create_reading(
-            user_id=user.user_id,
-            question=msg.text,
-            deck_type="rider_waite"
-        )
-        
-        await user_service.consume_message(user.user_id)
-        
-        full_text = BotMessages.TAROT_READING_MESSAGE.format(
-            question=msg.text,
-            card=reading.card_name,
-            interpretation=reading.interpretation,
-            advice=reading.advice,
-            remaining_messages=user.balance - 1
-        )
-        
-        await partial_message.edit_text(full_text)
+        async with ChatActionSender.typing(
+            bot=msg.bot, chat_id=msg.chat.id, interval=CHAT_ACTION_INTERVAL
+        ):
+            # Start the model request right away; the balance reservation runs alongside it
+            if settings.openai.STREAMING:
+                stream = tarot_service.stream_reading(
+                    user_id=msg.from_user.id,
+                    question=msg.text,
+                    deck_type="rider_waite",
+                    on_queued=notify_queued
+                )
+                generation = asyncio.create_task(anext(stream))
+            else:
+                generation = asyncio.create_task(tarot_service.create_reading(
+                    user_id=msg.from_user.id,
+                    question=msg.text,
+                    deck_type="rider_waite",
+                    on_queued=notify_queued
+                ))
+            
+            user = await user_service.get_or_create_user(user_id=msg.from_user.id)
+            
+            remaining = await user_service.reserve_message(user.user_id)
+            if remaining is None:
+                generation.cancel()
+                await msg.answer(
+                    text=BotMessages.NO_MESSAGES_MESSAGE,
+                    reply_markup=buy_messages_keyboard()
+                )
+                return
+            reserved = True
+            
+            partial_message = await msg.answer(BotMessages.TYPING_ANIMATION)
+            
+            reading = await generation
+            
+            if settings.openai.STREAMING:
+                editor = CoalescingMessageEditor(partial_message, settings.bot.STREAM_EDIT_INTERVAL)
+                await editor.update(render_reading(reading, remaining))
+                async for reading in stream:
+                    await editor.update(render_reading(reading, remaining))
+        
+        # Canned fallback text is not charged for
+        refunded = reading.is_fallback and await user_service.refund_message(user.user_id)
+        if refunded:
+            reserved = False
+            remaining += 1
+        
+        full_text = render_reading(reading, remaining)
+        # The notice promises the message was not charged, so only show it after a refund
+        if refunded and tarot_service.is_degraded():
+            full_text += BotMessages.DEGRADED_MODE_NOTICE
+        
+        if settings.openai.STREAMING:
+            await editor.flush(full_text)
+        else:
+            await partial_message.edit_text(full_text)
+        # Charged only once the user has actually seen the reading
+        reserved = False
         
     except Exception as e:
         print(f"Error handling text message: {e}")
+        if reserved:
+            await user_service.refund_message(msg.from_user.id)
         await msg.answer(BotMessages.ERROR_OCCURRED)
+    finally:
+        if generation and not generation.done():
+            generation.cancel()
+            await asyncio.gather(generation, return_exceptions=True)
+        # Closing the stream releases its GPT admission slot
+        if stream is not None:
+            await stream.aclose()
 
 
 @router.message(F.voice)
-async def handle_voice_message(msg: Message):
+async def handle_voice_message(
+    msg: Message,
+    user_service: IUserService,
+    tarot_service: ITarotService
+):
+    reserved = False
+    
     try:
-        container = await ContainerFactory.create_container()
-        user_service = container.get(IUserService)
-        tarot_service = container.get(ITarotService)
-        
-        user = await user_service.get_or_create_user(
-            user_id=msg.from_user.id,
-            username=msg.from_user.username,
-            first_name=msg.from_user.first_name,
-            last_name=msg.from_user.last_name
-        )
-        
-        if not await user_service.can_send_message(user.user_id):
-            await msg.answer(
-                text=BotMessages.NO_MESSAGES_MESSAGE,
-                reply_markup=buy_messages_keyboard()
+        async with ChatActionSender.record_voice(
+            bot=msg.bot, chat_id=msg.chat.id, interval=CHAT_ACTION_INTERVAL
+        ):
+            card, user = await asyncio.gather(
+                tarot_service.get_random_card(DeckType.RIDER_WAITE),
+                user_service.get_or_create_user(user_id=msg.from_user.id)
             )
-            return
-        
-        await msg.bot.send_chat_action(chat_id=msg.chat.id, action=ChatAction.RECORD_VOICE)
-        await asyncio.sleep(2)
-        
-        partial_message = await msg.answer("✍️ пе")
-        
-        await asyncio.sleep(3)
-        
-        reading = await tarot_service.create_reading(
-            user_id=user.user_id,
-            question="Голосовое сообщение",
-            deck_type="rider_waite"
-        )
-        
-        await user_service.consume_message(user.user_id)
+            
+            remaining = await user_service.reserve_message(user.user_id)
+            if remaining is None:
+                await msg.answer(
+                    text=BotMessages.NO_MESSAGES_MESSAGE,
+                    reply_markup=buy_messages_keyboard()
+                )
+                return
+            reserved = True
         
         full_text = BotMessages.VOICE_READING_MESSAGE.format(
             question="Голосовое сообщение",
-            card=reading.card_name,
-            remaining_messages=user.balance - 1
+            card=html.escape(card),
+            remaining_messages=remaining
         )
         
-        await partial_message.edit_text(full_text)
+        await msg.answer(full_text)
+        reserved = False
         
     except Exception as e:
         print(f"Error handling voice message: {e}")
+        if reserved:
+            await user_service.refund_message(msg.from_user.id)
         await msg.answer(BotMessages.ERROR_OCCURRED)
 
 
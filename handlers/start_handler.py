@@ -3,7 +3,6 @@ from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from container import ContainerFactory
 from messages import BotMessages
 from interfaces import IUserService
 
@@ -16,16 +15,13 @@ class StartStates(StatesGroup):
 
 
 @router.message(CommandStart())
-async def handle_start_command(message: Message, state: FSMContext):
+async def handle_start_command(message: Message, state: FSMContext, user_service: IUserService):
     try:
         user_id = message.from_user.id
         username = message.from_user.username
         first_name = message.from_user.first_name
         last_name = message.from_user.last_name
         
-        container = await ContainerFactory.create_container()
-        user_service = container.get(IUserService)
-        
         user = await user_service.get_or_create_user(user_id=user_id)
         
         if user:
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Optional, List
+from typing import AsyncIterator, Awaitable, Callable, Optional, List, Union
 from db.models import User, TarotReading, DeckType
 
 
@@ -27,7 +27,15 @@ class ITarotService(ABC):
         pass
     
     @abstractmethod
-    async def create_reading(self, user: User, question: str) -> TarotReading:
+    async def create_reading(self, user_id: int, question: str, deck_type: str = "rider_waite", on_queued: Optional[Callable[[], Awaitable[None]]] = None) -> TarotReading:
+        pass
+    
+    @abstractmethod
+    def stream_reading(self, user_id: int, question: str, deck_type: str = "rider_waite", on_queued: Optional[Callable[[], Awaitable[None]]] = None) -> AsyncIterator[TarotReading]:
+        pass
+    
+    @abstractmethod
+    def is_degraded(self) -> bool:
         pass
 
 
@@ -44,6 +52,14 @@ class IUserService(ABC):
     async def consume_message(self, user_id: int) -> bool:
         pass
     
+    @abstractmethod
+    async def reserve_message(self, user_id: int) -> Optional[int]:
+        pass
+    
+    @abstractmethod
+    async def refund_message(self, user_id: int) -> bool:
+        pass
+    
     @abstractmethod
     async def process_referral(self, new_user_id: int, referrer_id: int) -> bool:
         pass
@@ -91,7 +107,7 @@ class ILogger(ABC):
 
 class IValidator(ABC):
     @abstractmethod
-    def validate_user_id(self, user_id: str) -> bool:
+    def validate_user_id(self, user_id: Union[int, str]) -> bool:
         pass
     
     @abstractmethod
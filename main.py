@@ -1,4 +1,5 @@
 import asyncio
+import signal
 
 from aiogram import Dispatcher, Bot
 from aiogram.fsm.storage.memory import MemoryStorage
@@ -8,21 +9,47 @@ from handlers.start_handler import router as start_router
 from handlers.message_handler import router as message_router
 from handlers.callback_handler import router as callback_router
 from config import settings
+from concurrency import (
+    ChatOrderingMiddleware, PriorityLaneMiddleware, PriorityLanes,
+    LANE_INTERACTIVE, LANE_READING, LANE_VOICE
+)
+from container import ContainerFactory, ContainerMiddleware
 from core.bot import bot
 from core.logger import setup_logging
+from core.webhook import WebhookServer
 
 dp = Dispatcher(
     bot=bot,
     storage=MemoryStorage()
 )
 
+LANES = {
+    LANE_INTERACTIVE: settings.bot.INTERACTIVE_WORKERS,
+    LANE_READING: settings.bot.READING_WORKERS,
+    LANE_VOICE: settings.bot.VOICE_WORKERS
+}
+
+if not settings.webhook.ENABLED:
+    # The webhook server orders chats and caps lanes with its own queues and worker pools
+    dp.update.outer_middleware(ChatOrderingMiddleware(max_depth=settings.bot.CHAT_QUEUE_DEPTH))
+    dp.update.outer_middleware(PriorityLaneMiddleware(PriorityLanes(LANES)))
+dp.update.outer_middleware(ContainerMiddleware())
+
 dp.include_router(start_router)
 dp.include_router(message_router)
 dp.include_router(callback_router)
 
 
-async def startup(bot: Bot) -> None:
-    await bot.delete_webhook()
+async def startup(bot: Bot, dispatcher: Dispatcher) -> None:
+    dispatcher["container"] = await ContainerFactory.create_container()
+    if settings.webhook.ENABLED:
+        await bot.set_webhook(
+            url=settings.webhook.URL,
+            secret_token=settings.webhook.SECRET_TOKEN or None,
+            allowed_updates=dispatcher.resolve_used_update_types()
+        )
+    else:
+        await bot.delete_webhook()
     await bot.set_my_commands(
         commands=[
             {"command": "start", "description": "Начать работу с ботом"}
@@ -32,17 +59,53 @@ async def startup(bot: Bot) -> None:
     print('=== Arcana Bot started ===')
 
 
-async def shutdown(bot: Bot) -> None:
-    await bot.close()
-    await dp.stop_polling()
+async def shutdown(bot: Bot, dispatcher: Dispatcher) -> None:
+    await dispatcher["container"].cleanup()
+    if settings.webhook.ENABLED:
+        await bot.session.close()
+    else:
+        await bot.close()
+        await dp.stop_polling()
     print('=== Arcana Bot stopped ===')
 
 
+async def run_webhook() -> None:
+    server = WebhookServer(
+        dp,
+        bot,
+        path=settings.webhook.PATH,
+        secret_token=settings.webhook.SECRET_TOKEN,
+        queue_size=settings.webhook.QUEUE_SIZE,
+        lanes=LANES,
+        chat_queue_depth=settings.bot.CHAT_QUEUE_DEPTH
+    )
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    
+    # Dispatcher(bot=...) keeps the bot in workflow_data; pass it only once, like start_polling does
+    workflow_data = {**dp.workflow_data, "dispatcher": dp}
+    workflow_data.pop("bot", None)
+    
+    await dp.emit_startup(bot=bot, **workflow_data)
+    await server.start(settings.webhook.HOST, settings.webhook.PORT)
+    try:
+        await stop_event.wait()
+    finally:
+        await server.stop()
+        await dp.emit_shutdown(bot=bot, **workflow_data)
+
+
 async def main() -> None:
     setup_logging()
     dp.startup.register(startup)
     dp.shutdown.register(shutdown)
-    await dp.start_polling(bot)
+    if settings.webhook.ENABLED:
+        await run_webhook()
+    else:
+        await dp.start_polling(bot)
 
 
 if __name__ == "__main__":
@@ -15,6 +15,10 @@ class BotMessages:
     
     TYPING_ANIMATION = "✍️ Печатаю..."
     VOICE_PROCESSING = "🎤 Обрабатываю голосовое сообщение..."
+    DEGRADED_MODE_NOTICE = "\n⚠️ <i>Сервис толкований сейчас перегружен, поэтому ответ упрощённый. Сообщение не списано.</i>"
+    CHAT_QUEUE_FULL = "⏳ Я ещё отвечаю на ваши предыдущие сообщения. Дождитесь ответа и отправьте вопрос снова."
+    
+    READING_QUEUED = "⏳ Сейчас много запросов, ваш расклад в очереди. Ответ придёт чуть позже."
     
     BUY_MESSAGES = "🛒 Купить сообщения"
     INVITE_FRIEND = "👥 Пригласить подругу"
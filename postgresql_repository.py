@@ -1,9 +1,9 @@
-from typing import Dict, Optional
+from typing import Any, Dict, Optional, Set
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
 from sqlalchemy.exc import IntegrityError
 
-from db.models import User, UserSettings, ReferralData
+from db.models import User, UserSettings, ReferralData, DeckType
 from interfaces import IUserRepository
 from validators import SecurityValidator
 from core.database import UserModel
@@ -11,29 +11,70 @@ from core.database import UserModel
 
 class PostgreSQLUserRepository(IUserRepository):
 
-    def __init__(self, validator: SecurityValidator = None, db_manager=None):
+    def __init__(self, validator: SecurityValidator = None, db_manager=None, cache_manager=None, cache_ttl: int = 1800):
         self._validator = validator or SecurityValidator()
         self._db_manager = db_manager
+        self._cache_manager = cache_manager
+        self._cache_ttl = cache_ttl
+        # Users with a cache-aside fill in flight, and those written to while it ran
+        self._fills: Dict[int, int] = {}
+        self._stale_fills: Set[int] = set()
 
     async def _get_session(self) -> AsyncSession:
         return await self._db_manager.get_session()
 
+    def _cache_key(self, user_id: int) -> str:
+        return f"user:{user_id}"
+
+    async def _cache_user(self, user: User) -> None:
+        if self._cache_manager:
+            await self._cache_manager.set(
+                self._cache_key(user.user_id), self._user_to_dict(user), ttl=self._cache_ttl
+            )
+
+    async def _invalidate(self, user_id: int) -> None:
+        # Writes delete instead of writing through, so an older row can never overwrite a newer one
+        if user_id in self._fills:
+            self._stale_fills.add(user_id)
+        if self._cache_manager:
+            await self._cache_manager.delete(self._cache_key(user_id))
+
     async def get_user(self, user_id: int) -> Optional[User]:
         if not isinstance(user_id, int) or user_id <= 0:
             return None
             
-        if not self._validator.validate_user_id(str(user_id)):
+        if not self._validator.validate_user_id(user_id):
             return None
 
         try:
-            async with await self._get_session() as session:
-                stmt = select(UserModel).where(UserModel.user_id == user_id)
-                result = await session.execute(stmt)
-                user_model = result.scalar_one_or_none()
+            if self._cache_manager:
+                cached_user = await self._cache_manager.get(self._cache_key(user_id))
+                if cached_user:
+                    try:
+                        return self._dict_to_user(cached_user)
+                    except (KeyError, TypeError, ValueError) as e:
+                        # Entry in an older format; reload it from the database
+                        pass
+
+            self._fills[user_id] = self._fills.get(user_id, 0) + 1
+            try:
+                async with await self._get_session() as session:
+                    stmt = select(UserModel).where(UserModel.user_id == user_id)
+                    result = await session.execute(stmt)
+                    user_model = result.scalar_one_or_none()
                 
                 if user_model:
-                    return self._model_to_user(user_model)
+                    user = self._model_to_user(user_model)
+                    # A write that landed during the read may already be newer than this row
+                    if user_id not in self._stale_fills:
+                        await self._cache_user(user)
+                    return user
                 return None
+            finally:
+                self._fills[user_id] -= 1
+                if not self._fills[user_id]:
+                    del self._fills[user_id]
+                    self._stale_fills.discard(user_id)
                 
         except Exception as e:
             return None
@@ -42,7 +83,7 @@ class PostgreSQLUserRepository(IUserRepository):
         if not isinstance(user_id, int) or user_id <= 0:
             raise ValueError(f"Invalid user ID type or value: {user_id}")
             
-        if not self._validator.validate_user_id(str(user_id)):
+        if not self._validator.validate_user_id(user_id):
             raise ValueError(f"Invalid user ID format: {user_id}")
 
         if not isinstance(default_balance, int) or default_balance < 0 or default_balance > 10000:
@@ -56,7 +97,8 @@ class PostgreSQLUserRepository(IUserRepository):
                 session.add(user_model)
                 await session.commit()
                 await session.refresh(user_model)
-                
+            
+            await self._invalidate(user_id)
             return user
             
         except IntegrityError:
@@ -68,7 +110,7 @@ class PostgreSQLUserRepository(IUserRepository):
         if not isinstance(user, User):
             return False
 
-        if not self._validator.validate_user_id(str(user.user_id)):
+        if not self._validator.validate_user_id(user.user_id):
             return False
 
         try:
@@ -83,14 +125,15 @@ class PostgreSQLUserRepository(IUserRepository):
                     )
                 )
                 await session.commit()
-                
+            
+            await self._invalidate(user.user_id)
             return True
             
         except Exception as e:
             return False
 
     async def delete_user(self, user_id: int) -> bool:
-        if not self._validator.validate_user_id(str(user_id)):
+        if not self._validator.validate_user_id(user_id):
             return False
 
         try:
@@ -100,6 +143,8 @@ class PostgreSQLUserRepository(IUserRepository):
                 )
                 await session.commit()
                 
+                await self._invalidate(user_id)
+                
                 if result.rowcount > 0:
                     return True
                 return False
@@ -125,7 +170,9 @@ class PostgreSQLUserRepository(IUserRepository):
                     .values(balance=new_balance)
                 )
                 await session.commit()
-                return True
+            
+            await self._invalidate(user_id)
+            return True
                 
         except Exception as e:
             return False
@@ -137,13 +184,59 @@ class PostgreSQLUserRepository(IUserRepository):
                     update(UserModel)
                     .where(UserModel.user_id == user_id, UserModel.balance > 0)
                     .values(balance=UserModel.balance - 1)
+                    .returning(UserModel)
                 )
+                user_model = result.scalar_one_or_none()
                 await session.commit()
-                return result.rowcount > 0
+            
+            if user_model is not None:
+                await self._invalidate(user_id)
+            return user_model is not None
                 
         except Exception as e:
             return False
 
+    async def reserve_balance(self, user_id: int) -> Optional[int]:
+        try:
+            async with await self._get_session() as session:
+                result = await session.execute(
+                    update(UserModel)
+                    .where(UserModel.user_id == user_id, UserModel.balance > 0)
+                    .values(balance=UserModel.balance - 1)
+                    .returning(UserModel)
+                )
+                user_model = result.scalar_one_or_none()
+                await session.commit()
+            
+            if user_model is None:
+                return None
+            await self._invalidate(user_id)
+            return user_model.balance
+                
+        except Exception as e:
+            return None
+
+    async def increment_balance(self, user_id: int, amount: int = 1) -> Optional[int]:
+        if not isinstance(amount, int) or amount <= 0:
+            return None
+
+        try:
+            async with await self._get_session() as session:
+                result = await session.execute(
+                    update(UserModel)
+                    .where(UserModel.user_id == user_id)
+                    .values(balance=UserModel.balance + amount)
+                    .returning(UserModel)
+                )
+                user_model = result.scalar_one_or_none()
+                await session.commit()
+            
+            await self._invalidate(user_id)
+            return user_model.balance if user_model is not None else None
+                
+        except Exception as e:
+            return None
+
     async def add_referral_bonus(self, user_id: int, bonus: int) -> bool:
         if not isinstance(bonus, int) or bonus < 0:
             return False
@@ -156,7 +249,9 @@ class PostgreSQLUserRepository(IUserRepository):
                     .values(balance=UserModel.balance + bonus)
                 )
                 await session.commit()
-                return True
+            
+            await self._invalidate(user_id)
+            return True
                 
         except Exception as e:
             return False
@@ -189,6 +284,7 @@ class PostgreSQLUserRepository(IUserRepository):
                     )
                     await session.execute(update_stmt)
                     await session.commit()
+                    await self._invalidate(user_id)
                     return True
                 return False
                 
@@ -230,6 +326,7 @@ class PostgreSQLUserRepository(IUserRepository):
                     )
                     await session.execute(update_stmt)
                     await session.commit()
+                    await self._invalidate(user_id)
                     return True
                 return False
                 
@@ -259,11 +356,25 @@ class PostgreSQLUserRepository(IUserRepository):
             return {}
 
     def _model_to_user(self, model: UserModel) -> User:
-        settings_dict = model.settings or {}
-        referrals_dict = model.referrals or {}
+        return self._build_user(model.user_id, model.balance, model.settings, model.referrals)
+
+    def _dict_to_user(self, data: Dict[str, Any]) -> User:
+        return self._build_user(data['user_id'], data['balance'], data.get('settings'), data.get('referrals'))
+
+    def _user_to_dict(self, user: User) -> Dict[str, Any]:
+        return {
+            'user_id': user.user_id,
+            'balance': user.balance,
+            'settings': self._settings_to_dict(user.settings),
+            'referrals': self._referrals_to_dict(user.referrals)
+        }
+
+    def _build_user(self, user_id: int, balance: int, settings_dict: Optional[Dict], referrals_dict: Optional[Dict]) -> User:
+        settings_dict = settings_dict or {}
+        referrals_dict = referrals_dict or {}
         
         settings = UserSettings(
-            deck=settings_dict.get('deck', 'rider_waite'),
+            deck=DeckType(settings_dict.get('deck', 'rider_waite')),
             daily_tip_enabled=settings_dict.get('daily_tip_enabled', False),
             daily_tip_time=settings_dict.get('daily_tip_time', '18:00')
         )
@@ -271,12 +382,12 @@ class PostgreSQLUserRepository(IUserRepository):
         referrals = ReferralData(
             total_referrals=referrals_dict.get('total_referrals', 0),
             active_referrals=referrals_dict.get('active_referrals', 0),
-            referrals_list=referrals_dict.get('referrals_list', [])
+            referrals_list=list(referrals_dict.get('referrals_list') or [])
         )
         
         return User(
-            user_id=model.user_id,
-            balance=model.balance,
+            user_id=user_id,
+            balance=balance,
             settings=settings,
             referrals=referrals
         )
@@ -300,5 +411,6 @@ class PostgreSQLUserRepository(IUserRepository):
         return {
             'total_referrals': referrals.total_referrals,
             'active_referrals': referrals.active_referrals,
-            'referrals_list': referrals.referrals_list
+            # Copied so cached dicts and returned users never share a mutable list
+            'referrals_list': list(referrals.referrals_list)
         }
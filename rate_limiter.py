@@ -1,4 +1,8 @@
+import math
 import time
+import uuid
+import asyncio
+from collections import OrderedDict, deque
 from typing import Dict, Optional
 from dataclasses import dataclass
 from datetime import datetime, timedelta
@@ -8,68 +12,151 @@ from aiogram.types import Message, CallbackQuery, TelegramObject
 from messages import BotMessages
 
 
+SLIDING_WINDOW = "sliding_window"
+GCRA = "gcra"
+
+
 @dataclass
 class RateLimit:
     requests: int
     window_seconds: int
     block_duration_seconds: int = 300
+    # SLIDING_WINDOW keeps one sorted-set member per request; GCRA keeps a single timestamp per key
+    algorithm: str = SLIDING_WINDOW
+    
+    @property
+    def emission_interval(self) -> float:
+        return self.window_seconds / self.requests
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    remaining: int
+    retry_after: float = 0
 
 
 class RateLimitConfig:
     
     def __init__(self):
         self.default_limits = {
-            "message": RateLimit(requests=10, window_seconds=60),
-            "callback": RateLimit(requests=20, window_seconds=60),
+            "message": RateLimit(requests=10, window_seconds=60, algorithm=GCRA),
+            "callback": RateLimit(requests=20, window_seconds=60, algorithm=GCRA),
             "start": RateLimit(requests=5, window_seconds=300),
         }
+        self.memory_max_keys = 100000
+        self.memory_sweep_interval = 60
 
 
 class RedisRateLimitChecker:
     
+    # KEYS[1] window zset, KEYS[2] block flag
+    # ARGV: now_ms, window_ms, limit, block_ms, unique member suffix
+    # Returns {allowed, remaining, retry_after_ms}
+    SLIDING_WINDOW_SCRIPT = """
+local block_ttl = redis.call('PTTL', KEYS[2])
+if block_ttl > 0 then
+    return {0, 0, block_ttl}
+end
+
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local block = tonumber(ARGV[4])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+
+if count >= limit then
+    if block > 0 then
+        redis.call('SET', KEYS[2], '1', 'PX', block)
+        return {0, 0, block}
+    end
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+    return {0, 0, tonumber(oldest[2]) + window - now}
+end
+
+redis.call('ZADD', KEYS[1], now, ARGV[1] .. '-' .. ARGV[5])
+redis.call('PEXPIRE', KEYS[1], window)
+return {1, limit - count - 1, 0}
+"""
+    
+    # KEYS[1] theoretical arrival time (TAT) in ms, KEYS[2] block flag
+    # ARGV: now_ms, emission_interval_ms, burst, block_ms
+    # Returns {allowed, remaining, retry_after_ms}
+    GCRA_SCRIPT = """
+local block_ttl = redis.call('PTTL', KEYS[2])
+if block_ttl > 0 then
+    return {0, 0, block_ttl}
+end
+
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local block = tonumber(ARGV[4])
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+
+local new_tat = tat + interval
+local allow_at = new_tat - burst * interval
+
+if allow_at > now then
+    if block > 0 then
+        -- The block lives in its own key so the full burst is available once it expires
+        redis.call('SET', KEYS[2], '1', 'PX', block)
+        redis.call('DEL', KEYS[1])
+        return {0, 0, block}
+    end
+    return {0, 0, allow_at - now}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, math.floor((now - allow_at) / interval), 0}
+"""
+    
     def __init__(self, redis_client: redis.Redis):
         self.redis_client = redis_client
+        self._script = redis_client.register_script(self.SLIDING_WINDOW_SCRIPT)
+        self._gcra_script = redis_client.register_script(self.GCRA_SCRIPT)
     
-    async def check_redis_limit(
-        self, 
-        key: str, 
-        limit: RateLimit, 
-        current_time: int, 
-        window_start: int
-    ) -> bool:
-        pipe = self.redis_client.pipeline()
-        
-        pipe.zremrangebyscore(key, 0, window_start)
-        
-        pipe.zcard(key)
-        
-        pipe.zadd(key, {str(current_time): current_time})
-        
-        pipe.expire(key, limit.window_seconds)
-        
-        results = await pipe.execute()
-        current_requests = results[1]
-        
-        if current_requests >= limit.requests:
-            block_key = f"blocked:{key}"
-            is_blocked = await self.redis_client.get(block_key)
-            
-            if not is_blocked:
-                await self.redis_client.setex(
-                    block_key, 
-                    limit.block_duration_seconds, 
-                    "1"
-                )
-            
-            return False
-        
-        return True
+    async def check_redis_limit(self, key: str, limit: RateLimit, now: float) -> RateLimitResult:
+        allowed, remaining, retry_after_ms = await self._script(
+            keys=[key, f"blocked:{key}"],
+            args=[
+                int(now * 1000),
+                limit.window_seconds * 1000,
+                limit.requests,
+                limit.block_duration_seconds * 1000,
+                uuid.uuid4().hex
+            ]
+        )
+        return RateLimitResult(bool(allowed), int(remaining), int(retry_after_ms) / 1000)
+    
+    async def check_redis_gcra(self, key: str, limit: RateLimit, now: float) -> RateLimitResult:
+        allowed, remaining, retry_after_ms = await self._gcra_script(
+            keys=[key, f"blocked:{key}"],
+            args=[
+                int(now * 1000),
+                max(1, round(limit.emission_interval * 1000)),
+                limit.requests,
+                limit.block_duration_seconds * 1000
+            ]
+        )
+        return RateLimitResult(bool(allowed), int(remaining), int(retry_after_ms) / 1000)
 
 
 class MemoryRateLimitChecker:
     
-    def __init__(self):
-        self._memory_store: Dict[str, Dict] = {}
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # Both stores are kept in least-recently-used order
+        self._memory_store: "OrderedDict[str, Dict]" = OrderedDict()
+        self._gcra_store: "OrderedDict[str, float]" = OrderedDict()
+        self._gcra_blocks: "OrderedDict[str, float]" = OrderedDict()
+        self._sweeper_task: Optional[asyncio.Task] = None
     
     def check_memory_limit(
         self, 
@@ -77,42 +164,123 @@ class MemoryRateLimitChecker:
         limit: RateLimit, 
         current_time: int, 
         window_start: int
-    ) -> bool:
-        if key not in self._memory_store:
-            self._memory_store[key] = {
-                "requests": [],
-                "blocked_until": 0
+    ) -> RateLimitResult:
+        store = self._memory_store.get(key)
+        if store is None:
+            store = {
+                "requests": deque(),
+                "blocked_until": 0,
+                "expires_at": 0
             }
-        
-        store = self._memory_store[key]
+            self._memory_store[key] = store
+            self._evict_overflow(self._memory_store)
+        else:
+            self._memory_store.move_to_end(key)
         
         # Check if user is blocked
         if store["blocked_until"] > current_time:
-            return False
+            return RateLimitResult(False, 0, store["blocked_until"] - current_time)
         
         # Remove old requests
-        store["requests"] = [
-            req_time for req_time in store["requests"] 
-            if req_time > window_start
-        ]
+        requests = store["requests"]
+        while requests and requests[0] <= window_start:
+            requests.popleft()
         
         # Check limit
-        if len(store["requests"]) >= limit.requests:
+        if len(requests) >= limit.requests:
             store["blocked_until"] = current_time + limit.block_duration_seconds
-            return False
+            store["expires_at"] = max(store["expires_at"], store["blocked_until"])
+            return RateLimitResult(False, 0, limit.block_duration_seconds)
+        
+        requests.append(current_time)
+        store["expires_at"] = max(store["expires_at"], current_time + limit.window_seconds)
+        return RateLimitResult(True, limit.requests - len(requests))
+    
+    def check_memory_gcra(self, key: str, limit: RateLimit, now: float) -> RateLimitResult:
+        blocked_until = self._gcra_blocks.get(key, 0)
+        if blocked_until > now:
+            return RateLimitResult(False, 0, blocked_until - now)
+        
+        interval = limit.emission_interval
+        burst = limit.requests
+        tat = max(self._gcra_store.get(key, now), now)
+        if key in self._gcra_store:
+            self._gcra_store.move_to_end(key)
+        
+        new_tat = tat + interval
+        allow_at = new_tat - burst * interval
         
-        store["requests"].append(current_time)
-        return True
+        if allow_at > now:
+            if limit.block_duration_seconds > 0:
+                # Kept apart from the TAT so the full burst is available once the block expires
+                self._gcra_blocks[key] = now + limit.block_duration_seconds
+                self._evict_overflow(self._gcra_blocks)
+                self._gcra_store.pop(key, None)
+                return RateLimitResult(False, 0, limit.block_duration_seconds)
+            return RateLimitResult(False, 0, allow_at - now)
+        
+        self._gcra_store[key] = new_tat
+        self._evict_overflow(self._gcra_store)
+        return RateLimitResult(True, math.floor((now - allow_at) / interval))
+    
+    def _get_gcra_remaining(self, key: str, limit: RateLimit, now: float) -> int:
+        if self._gcra_blocks.get(key, 0) > now:
+            return 0
+        tat = max(self._gcra_store.get(key, now), now)
+        remaining = math.floor((now + limit.requests * limit.emission_interval - tat) / limit.emission_interval)
+        return max(0, min(limit.requests, remaining))
     
     def _get_current_requests(self, key: str, window_start: int) -> int:
         if key in self._memory_store:
-            store = self._memory_store[key]
-            store["requests"] = [
-                req_time for req_time in store["requests"] 
-                if req_time > window_start
-            ]
-            return len(store["requests"])
+            requests = self._memory_store[key]["requests"]
+            while requests and requests[0] <= window_start:
+                requests.popleft()
+            return len(requests)
         return 0
+    
+    def _evict_overflow(self, store: OrderedDict) -> None:
+        while len(store) > self.max_keys:
+            store.popitem(last=False)
+    
+    def sweep(self, now: Optional[float] = None) -> int:
+        # Drop keys whose state has fully decayed; they behave exactly like unseen keys
+        now = now or time.time()
+        idle_windows = [
+            key for key, store in self._memory_store.items() if store["expires_at"] <= now
+        ]
+        for key in idle_windows:
+            del self._memory_store[key]
+        
+        idle_gcra = [key for key, tat in self._gcra_store.items() if tat <= now]
+        for key in idle_gcra:
+            del self._gcra_store[key]
+        
+        expired_blocks = [key for key, until in self._gcra_blocks.items() if until <= now]
+        for key in expired_blocks:
+            del self._gcra_blocks[key]
+        
+        return len(idle_windows) + len(idle_gcra) + len(expired_blocks)
+    
+    async def _run_sweeper(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
+    
+    def start_sweeper(self, interval: float) -> None:
+        if self._sweeper_task is None:
+            self._sweeper_task = asyncio.create_task(self._run_sweeper(interval))
+    
+    async def stop_sweeper(self) -> None:
+        if self._sweeper_task:
+            self._sweeper_task.cancel()
+            try:
+                await self._sweeper_task
+            except asyncio.CancelledError:
+                pass
+            self._sweeper_task = None
+    
+    def __len__(self) -> int:
+        return len(self._memory_store) + len(self._gcra_store) + len(self._gcra_blocks)
 
 
 class RateLimiter:
@@ -122,7 +290,7 @@ class RateLimiter:
         self.redis_client: Optional[redis.Redis] = None
         self.config = RateLimitConfig()
         self.redis_checker: Optional[RedisRateLimitChecker] = None
-        self.memory_checker = MemoryRateLimitChecker()
+        self.memory_checker = MemoryRateLimitChecker(self.config.memory_max_keys)
     
     async def initialize(self):
         try:
@@ -143,43 +311,79 @@ class RateLimiter:
             # Fallback to in-memory rate limiting
             self.redis_client = None
             self.redis_checker = None
+            self.memory_checker.start_sweeper(self.config.memory_sweep_interval)
     
-    async def is_allowed(
+    async def check(
         self, 
         user_id: int, 
         action: str, 
         custom_limit: Optional[RateLimit] = None
-    ) -> bool:
+    ) -> RateLimitResult:
         limit = custom_limit or self.config.default_limits.get(action)
         if not limit:
-            return True
+            return RateLimitResult(True, float('inf'))
         
-        key = f"rate_limit:{action}:{user_id}"
-        current_time = int(time.time())
-        window_start = current_time - limit.window_seconds
+        key = self._key(user_id, action, limit)
+        now = time.time()
         
         try:
+            if limit.algorithm == GCRA:
+                if self.redis_checker:
+                    return await self.redis_checker.check_redis_gcra(key, limit, now)
+                return self.memory_checker.check_memory_gcra(key, limit, now)
+            
             if self.redis_checker:
-                return await self.redis_checker.check_redis_limit(key, limit, current_time, window_start)
+                return await self.redis_checker.check_redis_limit(key, limit, now)
             else:
+                current_time = int(now)
+                window_start = current_time - limit.window_seconds
                 return self.memory_checker.check_memory_limit(key, limit, current_time, window_start)
                 
         except Exception as e:
-            return True  # Allow on error to avoid blocking legitimate users
+            return RateLimitResult(True, limit.requests)  # Allow on error to avoid blocking legitimate users
+    
+    @staticmethod
+    def _key(user_id: int, action: str, limit: RateLimit) -> str:
+        if limit.algorithm == GCRA:
+            return f"rate_limit:gcra:{action}:{user_id}"
+        return f"rate_limit:{action}:{user_id}"
+    
+    async def is_allowed(
+        self, 
+        user_id: int, 
+        action: str, 
+        custom_limit: Optional[RateLimit] = None
+    ) -> bool:
+        result = await self.check(user_id, action, custom_limit)
+        return result.allowed
     
     async def get_remaining_requests(self, user_id: int, action: str) -> int:
         limit = self.config.default_limits.get(action)
         if not limit:
             return float('inf')
         
-        key = f"rate_limit:{action}:{user_id}"
+        key = self._key(user_id, action, limit)
         current_time = int(time.time())
         window_start = current_time - limit.window_seconds
         
         try:
+            if limit.algorithm == GCRA:
+                now = time.time()
+                if self.redis_client:
+                    if await self.redis_client.exists(f"blocked:{key}"):
+                        return 0
+                    tat = await self.redis_client.get(key)
+                    interval = limit.emission_interval
+                    tat = max(float(tat) / 1000 if tat else now, now)
+                    remaining = math.floor((now + limit.requests * interval - tat) / interval)
+                    return max(0, min(limit.requests, remaining))
+                return self.memory_checker._get_gcra_remaining(key, limit, now)
+            
             if self.redis_client:
-                await self.redis_client.zremrangebyscore(key, 0, window_start)
-                current_requests = await self.redis_client.zcard(key)
+                # Window scores are stored in milliseconds by the Lua checker
+                current_requests = await self.redis_client.zcount(
+                    key, f"({int((time.time() - limit.window_seconds) * 1000)}", "+inf"
+                )
             else:
                 current_requests = self.memory_checker._get_current_requests(key, window_start)
             
@@ -189,6 +393,7 @@ class RateLimiter:
             return limit.requests
     
     async def close(self):
+        await self.memory_checker.stop_sweeper()
         if self.redis_client:
             await self.redis_client.close()
 
@@ -220,14 +425,11 @@ class RateLimitMiddleware(BaseMiddleware):
         if not user_id or not action:
             return await handler(event, data)
         
-        is_allowed = await self.rate_limiter.is_allowed(user_id, action)
+        result = await self.rate_limiter.check(user_id, action)
         
-        if not is_allowed:
+        if not result.allowed:
             if isinstance(event, Message):
-                await event.answer(
-                    BotMessages.RATE_LIMIT_EXCEEDED,
-                    show_alert=True
-                )
+                await event.answer(BotMessages.RATE_LIMIT_EXCEEDED)
             elif isinstance(event, CallbackQuery):
                 await event.answer(
                     BotMessages.RATE_LIMIT_EXCEEDED,
@@ -236,8 +438,7 @@ class RateLimitMiddleware(BaseMiddleware):
             
             return
         
-        remaining = await self.rate_limiter.get_remaining_requests(user_id, action)
-        data["remaining_requests"] = remaining
+        data["remaining_requests"] = result.remaining
         
         return await handler(event, data)
 
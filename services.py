@@ -1,12 +1,13 @@
 import random
-from typing import Optional
-from dataclasses import asdict
+from typing import AsyncIterator, Optional
 from db.models import User, TarotReading, DeckType
+from concurrency import QueuedCallback
 from interfaces import IUserRepository, ITarotService, IUserService, IMessageService
 from validators import SecurityValidator
 from cache import CacheManager
 from messages import BotMessages
 from gpt_service import GPTService
+from config import settings
 
 
 class TarotService(ITarotService):
@@ -45,32 +46,68 @@ class TarotService(ITarotService):
         except Exception as e:
             raise
     
-    async def create_reading(self, user_id: int, question: str, deck_type: str = "rider_waite") -> TarotReading:
-        if not self._validator.validate_message_text(question):
+    async def create_reading(self, user_id: int, question: str, deck_type: str = "rider_waite", on_queued: Optional[QueuedCallback] = None) -> TarotReading:
+        sanitized_question = self._validator.clean_message_text(question)
+        if sanitized_question is None:
             raise ValueError("Invalid question text")
         
         try:
-            card = await self.get_random_card(deck_type)
-            sanitized_question = self._validator.sanitize_text(question)
+            card = await self.get_random_card(DeckType(deck_type))
             
-            interpretation = await self._generate_interpretation(card, sanitized_question)
-            advice = await self._generate_advice(card, sanitized_question)
+            if settings.openai.COMBINED_GENERATION:
+                interpretation, advice = await self._gpt_service.generate_reading(card, sanitized_question, on_queued)
+            else:
+                interpretation = await self._generate_interpretation(card, sanitized_question, on_queued)
+                advice = await self._generate_advice(card, sanitized_question, on_queued)
             
             return TarotReading(
-                card_name=card,
+                card=card,
                 question=sanitized_question,
                 interpretation=interpretation,
                 advice=advice,
-                remaining_messages=9
+                remaining_messages=9,
+                is_fallback=self._gpt_service.is_fallback(card, interpretation, advice)
             )
         except Exception as e:
             raise
     
-    async def _generate_interpretation(self, card: str, question: str) -> str:
-        return await self._gpt_service.generate_interpretation(card, question)
+    async def stream_reading(self, user_id: int, question: str, deck_type: str = "rider_waite", on_queued: Optional[QueuedCallback] = None) -> AsyncIterator[TarotReading]:
+        sanitized_question = self._validator.clean_message_text(question)
+        if sanitized_question is None:
+            raise ValueError("Invalid question text")
+        
+        card = await self.get_random_card(DeckType(deck_type))
+        
+        text = ""
+        async for chunk in self._gpt_service.stream_reading(card, sanitized_question, on_queued):
+            text += chunk
+            interpretation, advice = self._gpt_service.split_streamed_reading(text, card)
+            yield TarotReading(
+                card=card,
+                question=sanitized_question,
+                interpretation=interpretation,
+                advice=advice,
+                remaining_messages=9
+            )
+        
+        interpretation, advice = self._gpt_service.split_streamed_reading(text, card, complete=True)
+        yield TarotReading(
+            card=card,
+            question=sanitized_question,
+            interpretation=interpretation,
+            advice=advice,
+            remaining_messages=9,
+            is_fallback=self._gpt_service.is_fallback(card, interpretation, advice)
+        )
+    
+    def is_degraded(self) -> bool:
+        return self._gpt_service.is_degraded
     
-    async def _generate_advice(self, card: str, question: str) -> str:
-        return await self._gpt_service.generate_advice(card, question)
+    async def _generate_interpretation(self, card: str, question: str, on_queued: Optional[QueuedCallback] = None) -> str:
+        return await self._gpt_service.generate_interpretation(card, question, on_queued)
+    
+    async def _generate_advice(self, card: str, question: str, on_queued: Optional[QueuedCallback] = None) -> str:
+        return await self._gpt_service.generate_advice(card, question, on_queued)
 
 
 class UserService(IUserService):
@@ -79,36 +116,21 @@ class UserService(IUserService):
         self, 
         repository: IUserRepository, 
         referral_bonus: int = 10,
-        validator: SecurityValidator = None,
-        cache_manager: CacheManager = None
+        validator: SecurityValidator = None
     ):
         self.repository = repository
         self.referral_bonus = referral_bonus
         self._validator = validator or SecurityValidator()
-        self._cache_manager = cache_manager
     
     async def get_or_create_user(self, user_id: int) -> User:
-        if not self._validator.validate_user_id(str(user_id)):
+        if not self._validator.validate_user_id(user_id):
             raise ValueError(f"Invalid user ID: {user_id}")
         
-        try:
-            cache_key = f"user:{user_id}"
-            if self._cache_manager:
-                cached_user = await self._cache_manager.get(cache_key)
-                if cached_user:
-                    return User(**cached_user)
-            
-            user = await self.repository.get_or_create_user(user_id)
-            
-            if self._cache_manager:
-                await self._cache_manager.set(cache_key, asdict(user), ttl=1800)
-            
-            return user
-        except Exception as e:
-            raise
+        # The repository keeps user:{id} cached and writes every mutation through
+        return await self.repository.get_or_create_user(user_id)
     
     async def can_send_message(self, user_id: int) -> bool:
-        if not self._validator.validate_user_id(str(user_id)):
+        if not self._validator.validate_user_id(user_id):
             return False
         
         try:
@@ -118,7 +140,7 @@ class UserService(IUserService):
             return False
     
     async def consume_message(self, user_id: int) -> bool:
-        if not self._validator.validate_user_id(str(user_id)):
+        if not self._validator.validate_user_id(user_id):
             return False
         
         try:
@@ -126,11 +148,29 @@ class UserService(IUserService):
         except Exception as e:
             return False
     
+    async def reserve_message(self, user_id: int) -> Optional[int]:
+        if not self._validator.validate_user_id(user_id):
+            return None
+        
+        try:
+            return await self.repository.reserve_balance(user_id)
+        except Exception as e:
+            return None
+    
+    async def refund_message(self, user_id: int) -> bool:
+        if not self._validator.validate_user_id(user_id):
+            return False
+        
+        try:
+            return await self.repository.increment_balance(user_id) is not None
+        except Exception as e:
+            return False
+    
     async def process_referral(self, new_user_id: int, referrer_id: int) -> bool:
-        if not self._validator.validate_user_id(str(new_user_id)):
+        if not self._validator.validate_user_id(new_user_id):
             return False
         
-        if not self._validator.validate_user_id(str(referrer_id)):
+        if not self._validator.validate_user_id(referrer_id):
             return False
         
         if new_user_id == referrer_id:
@@ -160,7 +200,7 @@ class UserService(IUserService):
             return False
     
     def get_referral_link(self, user_id: int) -> str:
-        if not self._validator.validate_user_id(str(user_id)):
+        if not self._validator.validate_user_id(user_id):
             raise ValueError(f"Invalid user ID: {user_id}")
         
         return BotMessages.REFERRAL_LINK_TEMPLATE.format(user_id=user_id)
@@ -219,10 +259,9 @@ class ServiceFactory:
     @staticmethod
     def create_user_service(
         repository: IUserRepository, 
-        referral_bonus: int = 10,
-        cache_manager=None
+        referral_bonus: int = 10
     ) -> IUserService:
-        return UserService(repository, referral_bonus, cache_manager=cache_manager)
+        return UserService(repository, referral_bonus)
     
     @staticmethod
     def create_message_service() -> IMessageService:
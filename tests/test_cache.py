@@ -0,0 +1,82 @@
+import asyncio
+
+from cache import CacheManager
+
+
+class SlowRedisOperations:
+    
+    def __init__(self):
+        self.values = {}
+        self.release_reads = asyncio.Event()
+        self.release_reads.set()
+    
+    async def get(self, key):
+        value = self.values.get(key)
+        await self.release_reads.wait()
+        return value
+    
+    async def get_many(self, keys):
+        values = {key: self.values[key] for key in keys if key in self.values}
+        await self.release_reads.wait()
+        return values
+    
+    async def set(self, key, value, ttl=None):
+        self.values[key] = value
+        return True
+    
+    async def delete(self, key):
+        return self.values.pop(key, None) is not None
+
+
+def create_cache():
+    cache = CacheManager()
+    cache.redis_ops = SlowRedisOperations()
+    cache._publish_invalidation = lambda **payload: asyncio.sleep(0)
+    return cache
+
+
+def test_local_fill_skipped_when_key_deleted_during_redis_read():
+    async def scenario():
+        cache = create_cache()
+        cache.redis_ops.values["user:1"] = {"balance": 10}
+        cache.redis_ops.release_reads.clear()
+        
+        read = asyncio.create_task(cache.get("user:1"))
+        await asyncio.sleep(0)
+        await cache.delete("user:1")
+        cache.redis_ops.release_reads.set()
+        
+        assert await read == {"balance": 10}
+        assert cache.local_cache.get("user:1") is None
+        assert await cache.get("user:1") is None
+    
+    asyncio.run(scenario())
+
+
+def test_local_fill_skipped_when_key_set_during_redis_read():
+    async def scenario():
+        cache = create_cache()
+        cache.redis_ops.values["user:1"] = {"balance": 10}
+        cache.redis_ops.release_reads.clear()
+        
+        reads = asyncio.gather(cache.get("user:1"), cache.get_many(["user:1"]))
+        await asyncio.sleep(0)
+        await cache.set("user:1", {"balance": 9})
+        cache.redis_ops.release_reads.set()
+        await reads
+        
+        assert cache.local_cache.get("user:1") == {"balance": 9}
+        assert cache.local_cache._versions == {}
+    
+    asyncio.run(scenario())
+
+
+def test_local_fill_after_quiet_redis_read():
+    async def scenario():
+        cache = create_cache()
+        cache.redis_ops.values["user:1"] = {"balance": 10}
+        
+        assert await cache.get("user:1") == {"balance": 10}
+        assert cache.local_cache.get("user:1") == {"balance": 10}
+    
+    asyncio.run(scenario())
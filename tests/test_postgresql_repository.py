@@ -0,0 +1,96 @@
+import asyncio
+
+from sqlalchemy.sql import Select
+
+from cache import CacheManager
+from core.database import UserModel
+from postgresql_repository import PostgreSQLUserRepository
+
+USER_ID = 7
+
+
+class FakeResult:
+    
+    def __init__(self, model):
+        self._model = model
+    
+    def scalar_one_or_none(self):
+        return self._model
+
+
+class FakeSession:
+    
+    def __init__(self, db):
+        self._db = db
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return False
+    
+    async def commit(self):
+        pass
+    
+    async def execute(self, stmt):
+        if isinstance(stmt, Select):
+            # Snapshot the row first, then hold the read open until the test releases it
+            snapshot = UserModel(**self._db.row)
+            await self._db.release_reads.wait()
+            return FakeResult(snapshot)
+        self._db.row["balance"] = stmt.compile().params["balance"]
+        return FakeResult(None)
+
+
+class FakeDatabase:
+    
+    def __init__(self):
+        self.row = {
+            "user_id": USER_ID,
+            "balance": 10,
+            "settings": {},
+            "referrals": {"referrals_list": ["1"]}
+        }
+        self.release_reads = asyncio.Event()
+        self.release_reads.set()
+    
+    async def get_session(self):
+        return FakeSession(self)
+
+
+def create_repository():
+    db = FakeDatabase()
+    return db, PostgreSQLUserRepository(db_manager=db, cache_manager=CacheManager())
+
+
+def test_returned_referrals_list_does_not_alias_the_cache():
+    async def scenario():
+        _, repository = create_repository()
+        
+        user = await repository.get_user(USER_ID)
+        user.referrals.referrals_list.append("2")
+        
+        cached = await repository._cache_manager.get(f"user:{USER_ID}")
+        assert cached["referrals"]["referrals_list"] == ["1"]
+        assert (await repository.get_user(USER_ID)).referrals.referrals_list == ["1"]
+    
+    asyncio.run(scenario())
+
+
+def test_fill_overlapping_a_write_is_not_cached():
+    async def scenario():
+        db, repository = create_repository()
+        db.release_reads.clear()
+        
+        read = asyncio.create_task(repository.get_user(USER_ID))
+        await asyncio.sleep(0)
+        
+        assert await repository.update_balance(USER_ID, 3)
+        db.release_reads.set()
+        
+        # The read returns the row it saw, but must not cache it over the newer write
+        assert (await read).balance == 10
+        assert await repository._cache_manager.get(f"user:{USER_ID}") is None
+        assert (await repository.get_user(USER_ID)).balance == 3
+    
+    asyncio.run(scenario())
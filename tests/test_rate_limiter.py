@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import pytest
+
+from rate_limiter import GCRA, MemoryRateLimitChecker, RateLimit, RedisRateLimitChecker
+
+KEY = "rate_limit:gcra:message:1"
+
+
+def burst(check, count):
+    return [check().allowed for _ in range(count)]
+
+
+def test_memory_gcra_restores_full_burst_after_block():
+    checker = MemoryRateLimitChecker()
+    limit = RateLimit(requests=10, window_seconds=60, block_duration_seconds=300, algorithm=GCRA)
+    
+    assert all(burst(lambda: checker.check_memory_gcra(KEY, limit, 0.0), 10))
+    
+    blocked = checker.check_memory_gcra(KEY, limit, 0.0)
+    assert not blocked.allowed
+    assert blocked.retry_after == 300
+    assert not checker.check_memory_gcra(KEY, limit, 299.0).allowed
+    
+    # Once the block expires the user gets the whole burst again, not a single request
+    assert all(burst(lambda: checker.check_memory_gcra(KEY, limit, 301.0), 10))
+    assert not checker.check_memory_gcra(KEY, limit, 301.0).allowed
+
+
+def test_memory_gcra_without_block_waits_one_interval():
+    checker = MemoryRateLimitChecker()
+    limit = RateLimit(requests=10, window_seconds=60, block_duration_seconds=0, algorithm=GCRA)
+    
+    assert all(burst(lambda: checker.check_memory_gcra(KEY, limit, 0.0), 10))
+    result = checker.check_memory_gcra(KEY, limit, 0.0)
+    assert not result.allowed
+    assert result.retry_after == pytest.approx(6.0)
+    assert checker.check_memory_gcra(KEY, limit, 6.0).allowed
+
+
+def test_redis_gcra_restores_full_burst_after_block():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    
+    async def scenario():
+        checker = RedisRateLimitChecker(fakeredis.FakeAsyncRedis(decode_responses=True))
+        limit = RateLimit(requests=10, window_seconds=60, block_duration_seconds=1, algorithm=GCRA)
+        
+        for _ in range(10):
+            assert (await checker.check_redis_gcra(KEY, limit, time.time())).allowed
+        assert not (await checker.check_redis_gcra(KEY, limit, time.time())).allowed
+        
+        # The block flag expires on the Redis clock, so wait for it in real time
+        await asyncio.sleep(1.1)
+        for _ in range(10):
+            assert (await checker.check_redis_gcra(KEY, limit, time.time())).allowed
+        assert not (await checker.check_redis_gcra(KEY, limit, time.time())).allowed
+    
+    asyncio.run(scenario())
@@ -0,0 +1,80 @@
+import asyncio
+import html
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message
+
+TELEGRAM_TEXT_LIMIT = 4096
+ELLIPSIS = "…"
+
+
+def escape_truncated(text: str, limit: int) -> str:
+    # Cuts the raw text, never the escaped form, so no entity is split in half
+    escaped = html.escape(text)
+    if len(escaped) <= limit:
+        return escaped
+    if limit <= len(ELLIPSIS):
+        return ""
+    
+    size = limit - len(ELLIPSIS)
+    while size > 0:
+        escaped = html.escape(text[:size].rstrip())
+        if len(escaped) + len(ELLIPSIS) <= limit:
+            return escaped + ELLIPSIS
+        # One character escapes to at most six, so this step never cuts more than needed
+        size -= max(1, (len(escaped) + len(ELLIPSIS) - limit) // 6)
+    return ELLIPSIS
+
+
+class CoalescingMessageEditor:
+    
+    def __init__(self, message: Message, interval: float = 1.5):
+        self.message = message
+        self.interval = interval
+        self._last_text: Optional[str] = None
+        self._next_edit_at = 0.0
+    
+    async def update(self, text: str) -> None:
+        loop = asyncio.get_running_loop()
+        if loop.time() < self._next_edit_at or text == self._last_text:
+            return
+        await self._edit(text)
+    
+    async def flush(self, text: str) -> None:
+        loop = asyncio.get_running_loop()
+        delay = self._next_edit_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        
+        if not await self._edit(text):
+            delay = self._next_edit_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._edit(text, raise_errors=True)
+    
+    async def _edit(self, text: str, raise_errors: bool = False) -> bool:
+        if text == self._last_text:
+            return True
+        
+        loop = asyncio.get_running_loop()
+        try:
+            await self.message.edit_text(text)
+        except TelegramRetryAfter as e:
+            self._next_edit_at = loop.time() + e.retry_after
+            if raise_errors:
+                raise
+            return False
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                self._last_text = text
+                return True
+            # A persistent error would otherwise be retried on every streamed token
+            self._next_edit_at = loop.time() + self.interval
+            if raise_errors:
+                raise
+            return False
+        
+        self._last_text = text
+        self._next_edit_at = loop.time() + self.interval
+        return True
@@ -1,5 +1,5 @@
 import re
-from typing import Optional
+from typing import Iterable, List, Optional, Union
 from interfaces import IValidator
 
 
@@ -10,10 +10,30 @@ class SecurityValidator(IValidator):
     MIN_USER_ID = 1
     REFERRAL_PARAM_PATTERN = re.compile(r'^friend_\d{1,15}$')
     SAFE_TEXT_PATTERN = re.compile(
-        r'^[a-zA-Zа-яА-Я0-9\s\.,!?\-_@#$%&*()+=\[\]{}|\\:";\'<>\/\n\r\t]*$'
+        r'^[a-zA-Zа-яА-ЯёЁ0-9\s\.,!?\-_@#$%&*()+=\[\]{}|\\:";\'<>\/\n\r\t]*$'
     )
+    # Same alphabet with plain whitespace only: text without a match is safe and needs no control-char stripping
+    UNCLEAN_CHAR_PATTERN = re.compile(
+        r'[^a-zA-Zа-яА-ЯёЁ0-9 \.,!?\-_@#$%&*()+=\[\]{}|\\:";\'<>\/\n\r\t]'
+    )
+    CONTROL_CHAR_PATTERN = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
+    # All markers alternated into one automaton, matched against lowercased text instead of re.IGNORECASE
+    DANGEROUS_PATTERN = re.compile(
+        r'<script.*?>.*?</script>'
+        r'|javascript:'
+        r'|data:text/html'
+        r'|vbscript:'
+        r'|on(?:load|error|click)\s*='
+    )
+    INIT_DATA_PATTERN = re.compile(r'^[a-zA-Z0-9+/=._-]+$')
     
-    def validate_user_id(self, user_id: str) -> bool:
+    def validate_user_id(self, user_id: Union[int, str]) -> bool:
+        # bool is an int subclass, but str(True) never parsed as an id
+        if isinstance(user_id, bool):
+            return False
+        if type(user_id) is int:
+            return self.MIN_USER_ID <= user_id <= self.MAX_USER_ID
+        
         try:
             user_id_int = int(user_id)
             if not (self.MIN_USER_ID <= user_id_int <= self.MAX_USER_ID):
@@ -39,39 +59,46 @@ class SecurityValidator(IValidator):
             return False
     
     def validate_message_text(self, text: str) -> bool:
+        return self.clean_message_text(text) is not None
+    
+    def clean_message_text(self, text: str) -> Optional[str]:
         if not isinstance(text, str):
-            return False
+            return None
         
         if len(text) > self.MAX_MESSAGE_LENGTH:
+            return None
+        
+        # Typical messages are decided by this one scan; only exotic whitespace takes the slow path
+        if self.UNCLEAN_CHAR_PATTERN.search(text):
+            if not self.SAFE_TEXT_PATTERN.match(text):
+                return None
+            if self._contains_dangerous_markup(text):
+                return None
+            text = self.CONTROL_CHAR_PATTERN.sub('', text)
+        elif self._contains_dangerous_markup(text):
+            return None
+        
+        return text.strip() or None
+    
+    def validate_message_texts(self, texts: Iterable[str]) -> List[bool]:
+        clean = self.clean_message_text
+        return [clean(text) is not None for text in texts]
+    
+    def clean_message_texts(self, texts: Iterable[str]) -> List[Optional[str]]:
+        clean = self.clean_message_text
+        return [clean(text) for text in texts]
+    
+    def _contains_dangerous_markup(self, text: str) -> bool:
+        # Every marker needs one of these characters, so plain prose skips the pattern scan
+        if '<' not in text and ':' not in text and '=' not in text:
             return False
-        
-        if not text.strip():
-            return False
-        
-        dangerous_patterns = [
-            r'<script.*?>.*?</script>',
-            r'javascript:',
-            r'data:text/html',
-            r'vbscript:',
-            r'onload\s*=',
-            r'onerror\s*=',
-            r'onclick\s*=',
-        ]
-        
-        for pattern in dangerous_patterns:
-            if re.search(pattern, text, re.IGNORECASE):
-                return False
-        
-        if not self.SAFE_TEXT_PATTERN.match(text):
-            return False
-        
-        return True
+        return self.DANGEROUS_PATTERN.search(text.lower()) is not None
     
     def sanitize_text(self, text: str) -> str:
         if not isinstance(text, str):
             return ""
         
-        text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', text)
+        text = self.CONTROL_CHAR_PATTERN.sub('', text)
         
         text = text[:self.MAX_MESSAGE_LENGTH]
         
@@ -86,7 +113,7 @@ class SecurityValidator(IValidator):
         if len(init_data) > 2000:
             return False
         
-        if not re.match(r'^[a-zA-Z0-9+/=._-]+$', init_data):
+        if not self.INIT_DATA_PATTERN.match(init_data):
             return False
         
         return True